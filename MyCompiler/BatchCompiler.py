@@ -0,0 +1,84 @@
+import argparse
+import multiprocessing
+
+from LexicalAnalyzer import LexicalAnalyzer
+from LRParsers import add_parser_arguments, load_parser
+from SymbolTable import SymbolTableManager
+from SyntaxAnalyzer import SyntaxAnalyzer
+
+
+class BatchCompiler:
+    # Runs many files through the same lexer and parser. Building the automata and parsing
+    # tables is by far the most expensive part of compiling a single file, so it's done once
+    # here and the worker processes are forked from this one, inheriting the finished tables
+    # instead of each building (or unpickling) their own copy.
+    def __init__(self, lexer, parser, processes=None):
+        assert isinstance(lexer, LexicalAnalyzer)
+        self.lexer = lexer
+        self.syntax_analyzer = SyntaxAnalyzer(parser)
+        self.processes = processes
+
+    def compile_file(self, path):
+        # Returns (path, parse tree, None) on success or (path, None, error) on failure.
+        try:
+            with open(path, mode='r', encoding='utf-8') as f:
+                text = f.read()
+            # Every file gets a symbol table of its own
+            self.lexer.symbol_table_manager = SymbolTableManager()
+            tree = self.syntax_analyzer.process(self.lexer.process(text))
+            return path, tree, None
+        except Exception as e:
+            return path, None, repr(e)
+
+    def compile_files(self, paths, chunksize=8):
+        # Yields the result of compile_file for every path in whatever order they finish.
+        # Without fork (e.g. on Windows) the lexer and parser would have to be pickled into
+        # every worker, which they aren't built for, so the files are compiled here instead.
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            for path in paths:
+                yield self.compile_file(path)
+            return
+
+        context = multiprocessing.get_context('fork')
+        with context.Pool(self.processes, initializer=_init_worker, initargs=(self,)) as pool:
+            yield from pool.imap_unordered(_compile_file, paths, chunksize)
+
+
+# Forked workers find the parent's BatchCompiler here.
+_worker_batch_compiler = None
+
+
+def _init_worker(batch_compiler):
+    global _worker_batch_compiler
+    _worker_batch_compiler = batch_compiler
+
+
+def _compile_file(path):
+    return _worker_batch_compiler.compile_file(path)
+
+
+def main():
+    # Run from this directory so the textbook grammars can be found, e.g.
+    #   python BatchCompiler.py --grammar 4.40 --parser SLR1 a.c b.c c.c
+    argument_parser = argparse.ArgumentParser(description='Parse many files with the ANSI C lexer.')
+    argument_parser.add_argument('files', nargs='+')
+    add_parser_arguments(argument_parser)
+    argument_parser.add_argument('--processes', type=int, default=None)
+    argument_parser.add_argument('--print-trees', action='store_true')
+    args = argument_parser.parse_args()
+
+    batch_compiler = BatchCompiler(LexicalAnalyzer.ANSI_C_lexer(), load_parser(args), args.processes)
+    failures = 0
+    for path, tree, error in batch_compiler.compile_files(args.files):
+        if error is not None:
+            failures += 1
+            print(f'{path}: {error}')
+        else:
+            print(f'{path}: ok')
+            if args.print_trees:
+                print(tree)
+    print(f'{len(args.files) - failures}/{len(args.files)} files parsed')
+
+
+if __name__ == '__main__':
+    main()
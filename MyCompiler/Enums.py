@@ -1,4 +1,3 @@
-import string
 from enum import Enum
 
 
@@ -112,7 +111,16 @@ class ShorthandCharacterClass(Enum):
     NEGATED_WHITESPACE = 7
     ALPHA = 8
 
+    def is_negated(self):
+        # A negated class matches every character, not just every ASCII one, except the ones in
+        # its char set.
+        return self in (ShorthandCharacterClass.DOT,
+                        ShorthandCharacterClass.NEGATED_WORD,
+                        ShorthandCharacterClass.NEGATED_DIGIT,
+                        ShorthandCharacterClass.NEGATED_WHITESPACE)
+
     def to_char_set(self):
+        # The characters the class matches or, if it is negated, the ones it doesn't.
         if self == ShorthandCharacterClass.ALPHA:
             return set('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ')
         elif self == ShorthandCharacterClass.WORD:
@@ -124,13 +132,13 @@ class ShorthandCharacterClass(Enum):
         elif self == ShorthandCharacterClass.WHITESPACE:
             return set(' \n\t')
         elif self == ShorthandCharacterClass.DOT:
-            return set(string.printable).difference(set('\n'))
+            return set('\n')
         elif self == ShorthandCharacterClass.NEGATED_WORD:
-            return set(string.printable).difference(ShorthandCharacterClass.WORD.to_char_set())
+            return ShorthandCharacterClass.WORD.to_char_set()
         elif self == ShorthandCharacterClass.NEGATED_DIGIT:
-            return set(string.printable).difference(ShorthandCharacterClass.DIGIT.to_char_set())
+            return ShorthandCharacterClass.DIGIT.to_char_set()
         elif self == ShorthandCharacterClass.NEGATED_WHITESPACE:
-            return set(string.printable).difference(ShorthandCharacterClass.WHITESPACE.to_char_set())
+            return ShorthandCharacterClass.WHITESPACE.to_char_set()
         else:
             raise Exception('Not a shorthand for a character class.')
 
@@ -157,3 +165,9 @@ class LRAction(Enum):
     REDUCE = 2
     ACCEPT = 3
     ERROR = 4
+
+
+class Associativity(Enum):
+    LEFT = 1
+    RIGHT = 2
+    NONASSOC = 3
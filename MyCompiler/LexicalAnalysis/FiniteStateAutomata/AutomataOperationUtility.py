@@ -1,4 +1,6 @@
-from Elements import EmptyExpression
+from bisect import bisect_left, bisect_right
+
+from Elements import EmptyExpression, CharRangeElement
 from States import NFAState
 from Transition import Transition
 from States import BaseState
@@ -6,6 +8,9 @@ from Elements import BaseElement
 
 
 class AutomataOperationUtility:
+    # Characters below this get a DFA transition of their own, see elements_of_class
+    EXPANDED_CODE_POINTS = 128
+
     @staticmethod
     def epsilon_touching(s):
         states = set()
@@ -46,3 +51,98 @@ class AutomataOperationUtility:
                 if transition.element == a:
                     movable_states.add(transition.target)
         return movable_states
+
+    @staticmethod
+    def code_point_ranges(element):
+        # The ranges of code points element matches or None if it isn't a character at all.
+        if isinstance(element, CharRangeElement):
+            return element.value
+        if isinstance(element.value, str) and len(element.value) == 1:
+            return ((ord(element.value), ord(element.value)),)
+        return None
+
+    @classmethod
+    def partition_alphabet(cls, elements):
+        # Splits whatever the elements match into classes such that every element matches
+        # either all or none of a class, so automata only need one move per class instead of
+        # one per character. Character classes get cut up at every point where some element's
+        # range starts or ends and anything that isn't a character is a class on its own.
+        # Returns (classes, classes_of), a list of the classes, each either a CharRangeElement
+        # or one of the elements, and a dict from each element to the indexes of its classes.
+        boundaries = set()
+        opaque = []
+        for element in elements:
+            ranges = cls.code_point_ranges(element)
+            if ranges is None:
+                opaque.append(element)
+                continue
+            for first, last in ranges:
+                boundaries.add(first)
+                boundaries.add(last + 1)
+        points = sorted(boundaries)
+
+        classes = []
+        class_of_interval = dict()
+        classes_of = dict()
+        for element in elements:
+            ranges = cls.code_point_ranges(element)
+            if ranges is None:
+                continue
+            indexes = []
+            for first, last in ranges:
+                for k in range(bisect_left(points, first), bisect_left(points, last + 1)):
+                    if k not in class_of_interval:
+                        class_of_interval[k] = len(classes)
+                        classes.append(CharRangeElement([(points[k], points[k + 1] - 1)]))
+                    indexes.append(class_of_interval[k])
+            classes_of[element] = indexes
+        for element in opaque:
+            classes_of[element] = [len(classes)]
+            classes.append(element)
+        return classes, classes_of
+
+    @staticmethod
+    def class_finder(classes):
+        # Returns a function from an element to the index of the class in classes it belongs
+        # to or None.
+        starts = []
+        range_classes = []
+        opaque = dict()
+        for k, element in enumerate(classes):
+            if isinstance(element, CharRangeElement):
+                starts.append(element.value[0][0])
+                range_classes.append(k)
+            else:
+                opaque[element] = k
+        order = sorted(range(len(starts)), key=lambda k: starts[k])
+        starts = [starts[k] for k in order]
+        ends = [classes[range_classes[k]].value[0][1] for k in order]
+        range_classes = [range_classes[k] for k in order]
+
+        def find(element):
+            if isinstance(element.value, str) and len(element.value) == 1:
+                code = ord(element.value)
+                k = bisect_right(starts, code) - 1
+                if k >= 0 and code <= ends[k]:
+                    return range_classes[k]
+                return None
+            return opaque.get(element)
+        return find
+
+    @staticmethod
+    def elements_of_class(element):
+        # The elements a DFA transition on a class is made of. ASCII characters get a transition
+        # each so the common case is a single dict lookup, anything past them stays a range
+        # (see DFAState.transition_on) since a class like [^"] holds over a million of them.
+        if not isinstance(element, CharRangeElement):
+            return [element]
+        elements = []
+        rest = []
+        for first, last in element.value:
+            for code in range(first, min(last, AutomataOperationUtility.EXPANDED_CODE_POINTS - 1) + 1):
+                elements.append(BaseElement(chr(code)))
+            if last >= AutomataOperationUtility.EXPANDED_CODE_POINTS:
+                rest.append((max(first, AutomataOperationUtility.EXPANDED_CODE_POINTS), last))
+        if len(rest) > 0:
+            elements.append(CharRangeElement(rest))
+        return elements
@@ -0,0 +1,103 @@
+from AutomataOperationUtility import AutomataOperationUtility
+from BaseAutomata import BaseAutomata
+from Elements import EmptyExpression
+
+
+class CompiledNFA:
+    # A numbered copy of an NFA where every set of states is an int used as a bitset: bit i is
+    # set when state i is in the set. Input elements are grouped into the classes of
+    # AutomataOperationUtility.partition_alphabet and all the e-transitions are taken care of
+    # up front:
+    #   closures[i] is e-closure(s_i)
+    #   moves[i][k] is e-closure(move(s_i, a)) for any a in classes[k]
+    # so as long as we only ever hold e-closed sets of states, which e-closure(s_0) and the
+    # result of move are, nothing has to follow an e-transition while simulating the NFA or
+    # running the subset construction.
+    def __init__(self, nfa):
+        assert isinstance(nfa, BaseAutomata)
+        self.states = [nfa.start]
+        self.index_of = {nfa.start: 0}
+        i = 0
+        while i < len(self.states):
+            for transition in self.states[i].outgoing_flat():
+                if transition.target not in self.index_of:
+                    self.index_of[transition.target] = len(self.states)
+                    self.states.append(transition.target)
+            i += 1
+
+        epsilon_targets = []
+        raw_moves = []
+        self.accepting = 0
+        for i, state in enumerate(self.states):
+            targets = []
+            state_moves = dict()
+            for a, transition_list in state.outgoing.items():
+                for transition in transition_list:
+                    if isinstance(a, EmptyExpression):
+                        targets.append(self.index_of[transition.target])
+                    else:
+                        state_moves[a] = state_moves.get(a, 0) | (1 << self.index_of[transition.target])
+            epsilon_targets.append(targets)
+            raw_moves.append(state_moves)
+            if state.accepting:
+                self.accepting |= 1 << i
+
+        self.closures = []
+        for i in range(len(self.states)):
+            closure = 1 << i
+            stack = [i]
+            while len(stack) > 0:
+                for j in epsilon_targets[stack.pop()]:
+                    if not closure >> j & 1:
+                        closure |= 1 << j
+                        stack.append(j)
+            self.closures.append(closure)
+
+        elements = {a for state_moves in raw_moves for a in state_moves}
+        self.classes, classes_of = AutomataOperationUtility.partition_alphabet(elements)
+        self.moves = []
+        for state_moves in raw_moves:
+            class_moves = dict()
+            for a, targets in state_moves.items():
+                for k in classes_of[a]:
+                    class_moves[k] = class_moves.get(k, 0) | targets
+            self.moves.append({k: self.closure(targets) for k, targets in class_moves.items()})
+        self.raw_moves = raw_moves
+        self.start = self.closures[0]
+        self._find_class = AutomataOperationUtility.class_finder(self.classes)
+        self._class_cache = dict()
+
+    def class_of(self, a):
+        # Index of the class element a belongs to or None if nothing moves on it
+        if a not in self._class_cache:
+            self._class_cache[a] = self._find_class(a)
+        return self._class_cache[a]
+
+    def closure(self, S):
+        # e-closure of any set of states
+        closure = 0
+        for i in self.indexes(S):
+            closure |= self.closures[i]
+        return closure
+
+    def move(self, S, a):
+        # e-closure(move(S, a)) for an e-closed S
+        k = self.class_of(a)
+        if k is None:
+            return 0
+        moves = self.moves
+        T = 0
+        for i in self.indexes(S):
+            T |= moves[i].get(k, 0)
+        return T
+
+    def states_of(self, S):
+        return {self.states[i] for i in self.indexes(S)}
+
+    @staticmethod
+    def indexes(S):
+        # Yields the index of every bit set in S, lowest first.
+        while S:
+            lowest = S & -S
+            yield lowest.bit_length() - 1
+            S ^= lowest
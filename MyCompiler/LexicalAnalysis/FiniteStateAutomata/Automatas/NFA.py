@@ -1,52 +1,86 @@
 from AutomataOperationUtility import AutomataOperationUtility
 from BaseAutomata import BaseAutomata
+from CompiledNFA import CompiledNFA
 from DFA import DFA
-from Elements import BaseElement
-from States import DFAState
+from States import DFAState, NFAState
 from Transition import Transition
 
 
 class NFA(BaseAutomata):
-    def to_DFA(self):
+    def to_DFA(self, accepting_priority=None):
+        # accepting_priority is an optional key function over accepting NFA states. When it is
+        # given every accepting DFA state remembers the NFA state with the lowest key as its
+        # accepted_state, which lets a lexer resolve conflicting patterns once, here, instead
+        # of every time a lexeme is matched.
+        # The sets of NFA states are bitsets over a CompiledNFA, which already folded every
+        # e-closure into its moves.
+        compiled = CompiledNFA(self)
         Dtran = dict()
         # intially e-closure(s_0) is the only state in Dstates
-        start_dstate = frozenset(AutomataOperationUtility.epsilon_closure(self.start))
+        start_dstate = compiled.start
         Dstates = {start_dstate}
-        marked_states = set()
-        while True:
-            # while there is an unmarked state T in Dstates
-            unmarked_states = Dstates.difference(marked_states)
-            if len(unmarked_states) == 0:
-                break
-            T = unmarked_states.pop()
+        unmarked_states = [start_dstate]
+        # while there is an unmarked state T in Dstates
+        while len(unmarked_states) > 0:
             # mark T
-            marked_states.add(T)
-            # for each input symbol a
-            for a in self.alphabet:
-                assert isinstance(a, BaseElement)
-                U = frozenset(
-                    AutomataOperationUtility.epsilon_closure(
-                        AutomataOperationUtility.move(T, a)))
+            T = unmarked_states.pop()
+            # for each class of input symbols k that some state in T can move on. Symbols nothing
+            # in T moves on would only lead to the dead state, which we leave out of the DFA.
+            moves = dict()
+            for i in compiled.indexes(T):
+                for k, U in compiled.moves[i].items():
+                    moves[k] = moves.get(k, 0) | U
+            for k, U in moves.items():
                 if U not in Dstates:
                     Dstates.add(U)
-                Dtran[(T, a)] = U
+                    unmarked_states.append(U)
+                Dtran[(T, k)] = U
 
         count = 0
         DFA_states = dict()
         for dstate in Dstates:
             ID = count
             count += 1
-            accepting = any([state.accepting for state in dstate])
+            accepting_states = compiled.states_of(dstate & compiled.accepting)
             outgoing = None # We need to build all states before doing this
-            DFA_states[dstate] = DFAState(accepting=accepting, outgoing=outgoing, ID=ID)
+            DFA_state = DFAState(accepting=len(accepting_states) > 0, outgoing=outgoing, ID=ID)
+            if accepting_priority is not None and len(accepting_states) > 0:
+                DFA_state.accepted_state = min(accepting_states, key=accepting_priority)
+            DFA_states[dstate] = DFA_state
 
-        # 2nd pass to add transitions based on Dtran
-        for dstate in Dstates:
+        # 2nd pass to add transitions based on Dtran. A class of characters becomes a transition
+        # for each ASCII character in it and one on a range for the rest.
+        for (dstate, k), target_dstate in Dtran.items():
             DFA_state = DFA_states[dstate]
-            for element in self.alphabet:
-                target_dstate = Dtran[(dstate, element)]
-                target_DFA_state = DFA_states[target_dstate]
+            target_DFA_state = DFA_states[target_dstate]
+            for element in AutomataOperationUtility.elements_of_class(compiled.classes[k]):
                 DFA_state.add_outgoing(Transition(element, target_DFA_state))
 
         start_DFA_state = DFA_states[start_dstate]
         return DFA(start_DFA_state, self.alphabet)
+
+    def to_epsilon_free(self):
+        # An equivalent NFA without e-transitions. State q keeps a transition on a to every
+        # state some state in e-closure(q) has a transition on a to, and is accepting when
+        # anything in e-closure(q) is. States that could only be reached on e-transitions are
+        # dropped.
+        compiled = CompiledNFA(self)
+        reachable = 1
+        for raw_moves in compiled.raw_moves:
+            for targets in raw_moves.values():
+                reachable |= targets
+
+        new_states = dict()
+        for i in compiled.indexes(reachable):
+            new_states[i] = NFAState(
+                name=compiled.states[i].name,
+                accepting=compiled.closures[i] & compiled.accepting != 0)
+        for i, new_state in new_states.items():
+            targets = dict()
+            for p in compiled.indexes(compiled.closures[i]):
+                for a, U in compiled.raw_moves[p].items():
+                    targets[a] = targets.get(a, 0) | U
+            for a, U in targets.items():
+                for j in compiled.indexes(U):
+                    new_state.add_outgoing(Transition(a, new_states[j]))
+        return NFA(new_states[0], self.alphabet)
@@ -27,6 +27,25 @@ class NFAOneStartOneEnd(NFA):
             start_state = NFAState('i')
         return NFAOneStartOneEnd(start_state, Alphabet([element]), end_state)
 
+    def duplicate(self):
+        # A copy of the states and transitions that shares the elements with this NFA. Unlike
+        # deepcopy it doesn't recurse, so it works on NFAs of any size.
+        copies = {self.start: type(self.start)(name=self.start.name, accepting=self.start.accepting, ID=self.start.ID)}
+        stack = [self.start]
+        while len(stack) > 0:
+            state = stack.pop()
+            for transition in state.outgoing_flat():
+                target = transition.target
+                if target not in copies:
+                    copies[target] = type(target)(name=target.name, accepting=target.accepting, ID=target.ID)
+                    stack.append(target)
+                copies[state].add_outgoing(Transition(transition.element, copies[target]))
+        stop = copies.get(self.stop)
+        if stop is None:
+            # The end can't be reached from the start, e.g. for an unmatchable element
+            stop = type(self.stop)(name=self.stop.name, accepting=self.stop.accepting, ID=self.stop.ID)
+        return NFAOneStartOneEnd(copies[self.start], self.alphabet, stop)
+
     def __deepcopy__(self, memo=None):
         # I want to copy the structure of the graph but keep references to the same elements in transitions
 
@@ -72,3 +72,59 @@ class QuantifierElement(BaseElement):
         if start == 0 and stop == 1:
             value = '?'
         super().__init__(value)
+
+
+class CharRangeElement(BaseElement):
+    # A whole character class as one element. The value is a tuple of sorted, non-overlapping
+    # (first, last) code point ranges, e.g. [a-z_] is ((95, 95), (97, 122)). Ranges can go all
+    # the way up to MAX_CODE_POINT so negated classes cover every Unicode character.
+    MAX_CODE_POINT = 0x10FFFF
+
+    def __init__(self, ranges):
+        merged = []
+        for first, last in sorted(ranges):
+            if len(merged) > 0 and merged[-1][1] + 1 >= first:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+            else:
+                merged.append((first, last))
+        super().__init__(tuple(merged))
+
+    @staticmethod
+    def from_chars(chars):
+        return CharRangeElement((ord(char), ord(char)) for char in chars)
+
+    def union(self, other):
+        assert isinstance(other, CharRangeElement)
+        return CharRangeElement(self.value + other.value)
+
+    def complement(self):
+        # Every code point this doesn't match
+        ranges = []
+        first = 0
+        for start, last in self.value:
+            if first < start:
+                ranges.append((first, start - 1))
+            first = last + 1
+        if first <= CharRangeElement.MAX_CODE_POINT:
+            ranges.append((first, CharRangeElement.MAX_CODE_POINT))
+        return CharRangeElement(ranges)
+
+    def size(self):
+        return sum(last - first + 1 for first, last in self.value)
+
+    def chars(self):
+        for first, last in self.value:
+            for code in range(first, last + 1):
+                yield chr(code)
+
+    def __str__(self):
+        return '[' + ''.join(
+            CharRangeElement._code_str(first) if first == last else
+            f'{CharRangeElement._code_str(first)}-{CharRangeElement._code_str(last)}'
+            for first, last in self.value) + ']'
+    __repr__ = __str__
+
+    @staticmethod
+    def _code_str(code):
+        char = chr(code)
+        return char if char.isprintable() else f'\\u{{{code:x}}}'
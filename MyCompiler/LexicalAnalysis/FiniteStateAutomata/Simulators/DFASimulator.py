@@ -1,4 +1,3 @@
-from AutomataOperationUtility import AutomataOperationUtility
 from BaseSimulator import BaseSimulator
 from DFA import DFA
 from Elements import EOF
@@ -18,15 +17,48 @@ class DFASimulator(BaseSimulator):
 
     def simulate(self, expression):
         self.expression = expression
-        F = self.automata.ending_states()
         s = self.automata.start
         element_gen = self.next_element()
         c = next(element_gen)
         while not isinstance(c, EOF):
-            S = AutomataOperationUtility.epsilon_closure(AutomataOperationUtility.move({s}, c))
-            if len(S) == 0:
+            # A DFA has no e-transitions and at most one transition per element
+            transition = s.transition_on(c)
+            if transition is None:
                 # We hit a state with a transition that is unmatchable.
                 return False
-            s = S.pop()
+            s = transition.target
             c = next(element_gen)
-        return s in F
\ No newline at end of file
+        return s.accepting
+
+    def longest_match(self, expression, start=0, failed=None):
+        # Runs the DFA over expression[start:] until it has no transition to follow and returns
+        # the end of the longest accepted prefix along with the DFA state that accepted it.
+        # Only the last accepting position is kept so long lexemes don't build up any history.
+        # The empty prefix is never reported since a lexer could never make progress on it.
+        #
+        # failed is an optional set of (state, position) pairs shared between calls over the
+        # same expression, following Reps' "Maximal-Munch" Tokenization in Linear Time. Any
+        # pair visited after the last accepting position can never lead to an accepting state,
+        # so it is recorded and later scans stop as soon as they reach it. Repeatedly asking
+        # for the longest match is then linear in the length of the expression instead of
+        # quadratic on inputs that make every scan run far ahead before falling back.
+        s = self.automata.start
+        last_end = start
+        last_accepting_state = None
+        visited_since_accepting = []
+        for i in range(start, len(expression)):
+            if failed is not None:
+                if (s, i) in failed:
+                    break
+                visited_since_accepting.append((s, i))
+            transition = s.transition_on(expression[i])
+            if transition is None:
+                break
+            s = transition.target
+            if s.accepting:
+                last_end = i + 1
+                last_accepting_state = s
+                visited_since_accepting.clear()
+        if failed is not None:
+            failed.update(visited_since_accepting)
+        return last_end, last_accepting_state
@@ -0,0 +1,115 @@
+from BaseSimulator import BaseSimulator
+from Elements import EOF
+from NFA import NFA
+from NFASimulator import NFASimulator
+
+
+class LazyDFASimulator(BaseSimulator):
+    # Runs an NFA as a DFA that is built on demand, the same way RE2 does it. Every DFA state
+    # is a set of NFA states (a bitset, see CompiledNFA) and its transitions are only worked
+    # out by the NFA simulator the first time they are taken, after which following one is a
+    # single dict lookup like in a regular DFA.
+    # At most max_states DFA states are kept around. When there's no room for another one the
+    # whole cache is thrown away and rebuilt from whatever state we're in. If that happens
+    # again before we got through min_elements_per_state elements for every state in the
+    # cache, building DFA states isn't paying for itself on this input, so the rest of the run
+    # is simulated on the NFA directly.
+    def __init__(self, automata, max_states=10000, min_elements_per_state=10):
+        assert isinstance(automata, NFA)
+        super().__init__(automata)
+        self.expression = None
+        self.max_states = max_states
+        self.min_elements_per_state = min_elements_per_state
+        self._nfa_simulator = NFASimulator(automata)
+        self._compiled = self._nfa_simulator._compiled
+        # Maps a bitset of NFA states to its DFA state: [bitset, {element: DFA state}]
+        self._cache = dict()
+        # Elements run through so far and how many had been at the last flush, None before the
+        # cache was first thrown away
+        self._elements = 0
+        self._elements_at_flush = None
+        # How many times the cache was thrown away and how many runs gave up on it
+        self.flushes = 0
+        self.fallbacks = 0
+
+    def next_element(self):
+        for element in self.expression:
+            yield element
+        yield EOF()
+
+    def _get_state(self, S):
+        state = self._cache.get(S)
+        if state is None:
+            if len(self._cache) >= self.max_states:
+                # Filling the cache once is no sign of thrashing, only filling it again quickly is
+                thrashing = (self._elements_at_flush is not None and
+                             self._elements - self._elements_at_flush < self.max_states * self.min_elements_per_state)
+                self._cache.clear()
+                self._elements_at_flush = self._elements
+                self.flushes += 1
+                if thrashing:
+                    return None
+            state = self._cache[S] = [S, dict()]
+        return state
+
+    def _run(self, expression, start):
+        # Yields the set of NFA states after each element of expression[start:], stopping
+        # early once no state is left.
+        state = self._get_state(self._compiled.start)
+        if state is None:
+            self.fallbacks += 1
+            yield from self._run_on_NFA(expression, start, self._compiled.start)
+            return
+        for i in range(start, len(expression)):
+            c = expression[i]
+            self._elements += 1
+            next_state = state[1].get(c)
+            if next_state is None:
+                T = self._nfa_simulator.step(state[0], c)
+                next_state = self._get_state(T)
+                if next_state is None:
+                    # The cache is thrashing, simulate the NFA for the rest of the run
+                    self.fallbacks += 1
+                    yield T
+                    yield from self._run_on_NFA(expression, i + 1, T)
+                    return
+                state[1][c] = next_state
+            yield next_state[0]
+            if next_state[0] == 0:
+                return
+            state = next_state
+
+    def _run_on_NFA(self, expression, start, S):
+        for i in range(start, len(expression)):
+            if S == 0:
+                return
+            S = self._nfa_simulator.step(S, expression[i])
+            yield S
+
+    def longest_match(self, expression, start=0):
+        # Same as NFASimulator.longest_match
+        accepting = self._compiled.accepting
+        last_end = start
+        last_accepting = 0
+        for i, S in enumerate(self._run(expression, start), start + 1):
+            if S & accepting:
+                last_end = i
+                last_accepting = S & accepting
+        return last_end, self._compiled.states_of(last_accepting)
+
+    def simulate(self, expression):
+        self.expression = expression
+        S = self._compiled.start
+        count = 0
+        for count, S in enumerate(self._run(expression, 0), 1):
+            pass
+        if count < len(expression):
+            # We ran out of states before the end of the expression
+            return False
+        return S & self._compiled.accepting != 0
+
+    def simulate_gen(self, expression):
+        self.expression = expression
+        for S in self._run(expression, 0):
+            yield self._compiled.states_of(S & self._compiled.accepting)
+        yield EOF()
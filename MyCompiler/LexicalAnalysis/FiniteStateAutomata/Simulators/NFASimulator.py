@@ -1,5 +1,5 @@
-from AutomataOperationUtility import AutomataOperationUtility
 from BaseSimulator import BaseSimulator
+from CompiledNFA import CompiledNFA
 from Elements import EOF
 from NFA import NFA
 
@@ -9,34 +9,88 @@ class NFASimulator(BaseSimulator):
         assert isinstance(automata, NFA)
         super().__init__(automata)
         self.expression = None
+        # Sets of states are bitsets over the compiled NFA so no e-closures get computed while
+        # simulating.
+        self._compiled = CompiledNFA(automata)
+        # The move tables are kept per class of elements instead of per element.
+        # _class_moves[k][i] is where state i goes on an element of class k.
+        self._class_moves = [dict() for _ in self._compiled.classes]
+        for i, moves in enumerate(self._compiled.moves):
+            for k, U in moves.items():
+                self._class_moves[k][i] = U
+        # _tables[(chunk, k)][byte] is where the states 8 * chunk to 8 * chunk + 7 that are set
+        # in byte go on an element of class k, filled in as the simulation needs them.
+        self._tables = dict()
 
     def next_element(self):
         for element in self.expression:
             yield element
         yield EOF()
 
+    def step(self, S, c):
+        # The set of states reachable from S on c. Instead of going over S one state at a time
+        # it's taken a byte, or 8 states, at a time and each byte is looked up in a table.
+        k = self._compiled.class_of(c)
+        if k is None:
+            return 0
+        T = 0
+        while S:
+            shift = ((S & -S).bit_length() - 1) & ~7
+            byte = S >> shift & 0xFF
+            S ^= byte << shift
+            table = self._tables.get((shift >> 3, k))
+            if table is None:
+                table = self._tables[(shift >> 3, k)] = [None] * 256
+            U = table[byte]
+            if U is None:
+                moves = self._class_moves[k]
+                U = 0
+                for b in range(8):
+                    if byte >> b & 1:
+                        U |= moves.get(shift + b, 0)
+                table[byte] = U
+            T |= U
+        return T
+
+    def longest_match(self, expression, start=0):
+        # Runs the NFA over expression[start:] until no state is left and returns the end of
+        # the longest accepted prefix along with the set of accepting NFA states reached there.
+        # The empty prefix is never reported.
+        compiled = self._compiled
+        S = compiled.start
+        last_end = start
+        last_accepting = 0
+        for i in range(start, len(expression)):
+            S = self.step(S, expression[i])
+            if S == 0:
+                break
+            if S & compiled.accepting:
+                last_end = i + 1
+                last_accepting = S & compiled.accepting
+        return last_end, compiled.states_of(last_accepting)
+
     def simulate(self, expression):
         self.expression = expression
-        F = self.automata.ending_states()
-        S = AutomataOperationUtility.epsilon_closure(self.automata.start)
+        compiled = self._compiled
+        S = compiled.start
         element_gen = self.next_element()
         c = next(element_gen)
         while not isinstance(c, EOF):
-            S = AutomataOperationUtility.epsilon_closure(AutomataOperationUtility.move(S, c))
+            S = self.step(S, c)
             c = next(element_gen)
-        return len(S.intersection(F)) != 0
+        return S & compiled.accepting != 0
 
     def simulate_gen(self, expression):
         self.expression = expression
-        F = self.automata.ending_states()
-        S = AutomataOperationUtility.epsilon_closure(self.automata.start)
+        compiled = self._compiled
+        S = compiled.start
         element_gen = self.next_element()
         c = next(element_gen)
         stop_sim = False
         while not isinstance(c, EOF):
-            S = AutomataOperationUtility.epsilon_closure(AutomataOperationUtility.move(S, c))
-            yield S.intersection(F)
-            if len(S) == 0:
+            S = self.step(S, c)
+            yield compiled.states_of(S & compiled.accepting)
+            if S == 0:
                 # We hit a state with a transition that is unmatchable.
                 break
             c = next(element_gen)
@@ -1,6 +1,8 @@
 import copy
+from bisect import bisect_right
 
 import Transition
+from Elements import CharRangeElement
 
 
 class BaseState:
@@ -76,17 +78,43 @@ class DFAState(BaseState):
     # Deterministic Finite LexicalAnalysis
     # outgoing is a dictionary of key value pairs where the keys are of type Element
     # and the values of type Transition
+    # accepted_state is the NFA state that wins when this state is accepting and came
+    # from a subset construction that was asked to resolve between accepting states.
+    # Transitions on a CharRangeElement are also kept in _ranges, a sorted list of
+    # (first, last, transition), so transition_on can find them for any character they hold.
     def __init__(self, name=None, accepting=False, outgoing=None, ID=None):
         super().__init__(name, accepting, outgoing, ID)
+        self.accepted_state = None
+        self._ranges = []
         assert isinstance(self.outgoing, dict)
         for element, transition in self.outgoing.items():
             assert isinstance(transition, Transition.Transition)
             assert element == transition.element
+            self._add_ranges(transition)
 
     def _add_outgoing(self, transition):
         if transition.element in self.outgoing:
             raise Exception('Transition already exists for given Element.')
         self.outgoing[transition.element] = transition
+        self._add_ranges(transition)
+
+    def _add_ranges(self, transition):
+        if isinstance(transition.element, CharRangeElement):
+            for first, last in transition.element.value:
+                self._ranges.append((first, last, transition))
+            self._ranges.sort(key=lambda entry: entry[0])
+            self._range_starts = [entry[0] for entry in self._ranges]
+
+    def transition_on(self, element):
+        # The transition to take on element or None
+        transition = self.outgoing.get(element)
+        if transition is None and len(self._ranges) > 0 and \
+                isinstance(element.value, str) and len(element.value) == 1:
+            code = ord(element.value)
+            k = bisect_right(self._range_starts, code) - 1
+            if k >= 0 and code <= self._ranges[k][1]:
+                return self._ranges[k][2]
+        return transition
 
     def _outgoing_flat(self):
         return [transition for transition in self.outgoing.values()]
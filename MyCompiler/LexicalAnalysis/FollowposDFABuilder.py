@@ -0,0 +1,143 @@
+import math
+
+from Alphabet import Alphabet
+from AutomataOperationUtility import AutomataOperationUtility
+from DFA import DFA
+from Elements import BaseElement, EmptyExpression, UnmatchableElement
+from Enums import RegexOperation
+from RegExpr import RegExpr, RegExprParseTree
+from States import DFAState
+from Transition import Transition
+
+
+class FollowposDFABuilder:
+    # Builds a DFA straight from the parse trees of regular expressions without going through
+    # Thompson's construction, see section 3.9.5 of the dragon book.
+    # Every leaf of a parse tree that matches a character is a position. For each node we
+    # compute:
+    #   nullable(n): whether the language of n contains the empty string
+    #   firstpos(n): the positions that can match the first character of a string of n
+    #   lastpos(n): the positions that can match the last character of a string of n
+    # and from those, for every position p, followpos(p): the positions that can come right
+    # after p. A DFA state is then a set of positions. Each regular expression r added here
+    # is turned into (r)# with an end marker # of its own, so a state is accepting for r when
+    # it holds r's end marker.
+    # Sub-definitions and every copy a bounded quantifier {n,m} needs are walked again rather
+    # than copied, which gives them positions of their own.
+    def __init__(self):
+        # symbols[p] is the element position p matches or None for an end marker, in which
+        # case accepted_states[p] is what a DFA state holding it accepts.
+        self.symbols = []
+        self.accepted_states = []
+        self.followpos = []
+        self.start = set()
+
+    def add(self, regex, accepted_state):
+        # Adds (regex)# as one more alternative of the DFA.
+        assert isinstance(regex, RegExpr)
+        nullable, firstpos, lastpos = self._walk(regex.parse_tree)
+        end_marker = self._new_position(None, accepted_state)
+        for p in lastpos:
+            self.followpos[p].add(end_marker)
+        self.start.update(firstpos)
+        if nullable:
+            self.start.add(end_marker)
+
+    def build(self, accepting_priority=None):
+        # Same as NFA.to_DFA except that the states of the DFA are sets of positions. With
+        # accepting_priority every accepting DFA state remembers the accepted_state with the
+        # lowest key when several end markers end up in the same DFA state.
+        # Symbols can overlap, e.g. [a-z] and a, so moves are worked out per class of characters
+        classes, classes_of = AutomataOperationUtility.partition_alphabet(
+            {symbol for symbol in self.symbols if symbol is not None})
+        start_dstate = frozenset(self.start)
+        Dstates = {start_dstate}
+        unmarked_states = [start_dstate]
+        Dtran = dict()
+        while len(unmarked_states) > 0:
+            T = unmarked_states.pop()
+            # The positions in T that match class k, grouped by k
+            moves = dict()
+            for p in T:
+                if self.symbols[p] is not None:
+                    for k in classes_of[self.symbols[p]]:
+                        moves.setdefault(k, set()).update(self.followpos[p])
+            for k, move in moves.items():
+                U = frozenset(move)
+                if U not in Dstates:
+                    Dstates.add(U)
+                    unmarked_states.append(U)
+                Dtran[(T, k)] = U
+
+        DFA_states = dict()
+        for ID, dstate in enumerate(Dstates):
+            accepted_states = [self.accepted_states[p] for p in dstate if self.symbols[p] is None]
+            DFA_state = DFAState(accepting=len(accepted_states) > 0, ID=ID)
+            if accepting_priority is not None and len(accepted_states) > 0:
+                DFA_state.accepted_state = min(accepted_states, key=accepting_priority)
+            DFA_states[dstate] = DFA_state
+
+        alphabet = set()
+        for (dstate, k), target_dstate in Dtran.items():
+            for element in AutomataOperationUtility.elements_of_class(classes[k]):
+                DFA_states[dstate].add_outgoing(Transition(element, DFA_states[target_dstate]))
+                alphabet.add(element)
+
+        return DFA(DFA_states[start_dstate], Alphabet(alphabet))
+
+    def _new_position(self, symbol, accepted_state=None):
+        self.symbols.append(symbol)
+        self.accepted_states.append(accepted_state)
+        self.followpos.append(set())
+        return len(self.symbols) - 1
+
+    def _walk(self, parse_tree):
+        # Returns (nullable, firstpos, lastpos) of parse_tree, adding its positions and their
+        # followpos along the way.
+        assert isinstance(parse_tree, RegExprParseTree)
+        if parse_tree.operation == RegexOperation.IDENTITY:
+            element = parse_tree.left
+            assert isinstance(element, BaseElement)
+            if isinstance(element.value, RegExpr):
+                return self._walk(element.value.parse_tree)
+            if isinstance(element, UnmatchableElement):
+                return False, set(), set()
+            if isinstance(element, EmptyExpression):
+                return True, set(), set()
+            p = self._new_position(element)
+            return False, {p}, {p}
+        elif parse_tree.operation == RegexOperation.UNION:
+            nullable_1, firstpos_1, lastpos_1 = self._walk(parse_tree.left)
+            nullable_2, firstpos_2, lastpos_2 = self._walk(parse_tree.right)
+            return nullable_1 or nullable_2, firstpos_1 | firstpos_2, lastpos_1 | lastpos_2
+        elif parse_tree.operation == RegexOperation.CONCAT:
+            return self._concat(self._walk(parse_tree.left), self._walk(parse_tree.right))
+        elif parse_tree.operation == RegexOperation.QUANTIFIER:
+            # r{n,m} is n copies of r followed by m - n copies of r? or by r* when m is infinite
+            quantifier = parse_tree.right
+            result = (True, set(), set())
+            for _ in range(quantifier.start):
+                result = self._concat(result, self._walk(parse_tree.left))
+            if quantifier.stop == math.inf:
+                nullable, firstpos, lastpos = self._walk(parse_tree.left)
+                for p in lastpos:
+                    self.followpos[p].update(firstpos)
+                result = self._concat(result, (True, firstpos, lastpos))
+            else:
+                for _ in range(quantifier.stop - quantifier.start):
+                    nullable, firstpos, lastpos = self._walk(parse_tree.left)
+                    result = self._concat(result, (True, firstpos, lastpos))
+            return result
+        elif parse_tree.operation == RegexOperation.GROUP or parse_tree.operation == RegexOperation.CHAR_CLASS:
+            return self._walk(parse_tree.left)
+        else:
+            raise Exception('Hey dummy you forgot to implement the graph operation for an operator')
+
+    def _concat(self, c_1, c_2):
+        nullable_1, firstpos_1, lastpos_1 = c_1
+        nullable_2, firstpos_2, lastpos_2 = c_2
+        for p in lastpos_1:
+            self.followpos[p].update(firstpos_2)
+        return (nullable_1 and nullable_2,
+                firstpos_1 | firstpos_2 if nullable_1 else firstpos_1,
+                lastpos_1 | lastpos_2 if nullable_2 else lastpos_2)
@@ -0,0 +1,46 @@
+from bisect import bisect_left, bisect_right
+
+
+class LexerCheckpoints:
+    # What LexicalAnalyzer.process_with_checkpoints remembers about a text so that it can be
+    # lexed again after an edit without starting over. Every lexeme boundary is a point lexing
+    # can resume from since each lexeme is scanned starting from the DFA's start state.
+    # lexemes holds a (start, end, examined, token) tuple per lexeme, where examined is one
+    # past the furthest character the scan for that lexeme looked at. A lexeme only has to be
+    # lexed again when an edit touches text before examined.
+    def __init__(self, text, lexemes):
+        self.text = text
+        self.lexemes = lexemes
+        self.starts = [lexeme[0] for lexeme in lexemes]
+        # The furthest any scan looked past the end of its lexeme. This bounds how far back an
+        # edit can reach.
+        self.max_lookahead = max((examined - end for _, end, examined, _ in lexemes), default=0)
+
+    def tokens(self):
+        return [lexeme[3] for lexeme in self.lexemes if lexeme[3] is not None]
+
+    def restart_index(self, position):
+        # Index of the first lexeme whose scan depended on anything at position or after it.
+        i = max(bisect_right(self.starts, position) - 1, 0)
+        k = i - 1
+        while k >= 0 and self.lexemes[k][1] + self.max_lookahead >= position:
+            if self.lexemes[k][2] > position:
+                i = k
+            k -= 1
+        return i
+
+    def index_starting_at(self, position):
+        # Index of the lexeme that starts at position or None if position is inside a lexeme.
+        k = bisect_left(self.starts, position)
+        if k < len(self.starts) and self.starts[k] == position:
+            return k
+        return None
+
+    def splice(self, text, i, j, lexemes, delta):
+        # Replaces lexemes[i:j] with the given ones and shifts every lexeme after them by delta.
+        self.text = text
+        self.lexemes = self.lexemes[:i] + lexemes + [
+            (start + delta, end + delta, examined + delta, token)
+            for start, end, examined, token in self.lexemes[j:]]
+        self.starts = [lexeme[0] for lexeme in self.lexemes]
+        self.max_lookahead = max([self.max_lookahead] + [examined - end for _, end, examined, _ in lexemes])
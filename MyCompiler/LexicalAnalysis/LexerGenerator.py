@@ -0,0 +1,99 @@
+from LexicalAnalyzer import LexicalAnalyzer
+
+
+class LexerGenerator:
+    # Writes a lexer out as a standalone Python module, the way lex does for C. The module holds
+    # the lexer's LexerTable as literals and a scan loop over them, and only imports bisect from
+    # the standard library, so importing it builds no automata at all.
+    # The translation rules' actions can't come along since they're arbitrary Python, so the
+    # generated lexer yields (token name, lexeme) pairs instead of tokens. The token name of a
+    # pattern is the name of the token class when its action is a token's lex_action, the name
+    # of the pattern for any other action and None for patterns without a translation rule,
+    # whose lexemes are skipped just like LexicalAnalyzer skips them.
+    def __init__(self, lexical_analyzer):
+        assert isinstance(lexical_analyzer, LexicalAnalyzer)
+        self.lexical_analyzer = lexical_analyzer
+
+    def token_names(self):
+        # The token name of every rule in the lexer table
+        actions = {d_i.value: action for d_i, action in self.lexical_analyzer.translation_rules}
+        names = []
+        for production_state in self.lexical_analyzer._orig_NFAs:
+            regex = production_state.d_i
+            if regex not in actions:
+                names.append(None)
+            elif getattr(actions[regex], '__name__', None) == 'lex_action' and \
+                    isinstance(getattr(actions[regex], '__self__', None), type):
+                names.append(actions[regex].__self__.__name__)
+            else:
+                names.append(regex.name)
+        return names
+
+    def generate(self):
+        # Returns the source of the module
+        table = self.lexical_analyzer.get_lexer_table()
+        lines = [
+            '# Generated by LexerGenerator, do not edit.',
+            'from bisect import bisect_right',
+            '',
+            '# TRANSITIONS[s] maps a character to the state after s, 0 is the start state.',
+            '# RANGES[s] holds (first, last, next state) for the code points state s moves on that',
+            '# are not in TRANSITIONS[s] and RANGE_STARTS[s] the firsts alone.',
+            '# RULES[s] is the rule state s accepts or None and TOKENS[rule] the name of its token.',
+            'TRANSITIONS = (',
+        ]
+        lines.extend(f'    {transitions!r},' for transitions in table.transitions)
+        lines.append(')')
+        lines.append('RANGES = (')
+        lines.extend(f'    {tuple(ranges)!r},' for ranges in table.ranges)
+        lines.append(')')
+        lines.append('RANGE_STARTS = tuple(tuple(first for first, _, _ in ranges) for ranges in RANGES)')
+        lines.append(f'RULES = {tuple(table.rules)!r}')
+        lines.append(f'TOKENS = {tuple(self.token_names())!r}')
+        lines.append(_SCANNER)
+        return '\n'.join(lines)
+
+    def write(self, path):
+        with open(path, mode='w', encoding='utf-8') as f:
+            f.write(self.generate())
+
+
+# The part of the generated module that doesn't depend on the lexer, see LexerTable.longest_match
+_SCANNER = '''
+
+def longest_match(text, start):
+    # Returns (end, rule) for the longest lexeme starting at start, rule is None if there's none.
+    transitions = TRANSITIONS
+    rules = RULES
+    s = 0
+    last_end = start
+    last_rule = None
+    for i in range(start, len(text)):
+        t = transitions[s].get(text[i])
+        if t is None:
+            ranges = RANGES[s]
+            if len(ranges) == 0:
+                break
+            code = ord(text[i])
+            k = bisect_right(RANGE_STARTS[s], code) - 1
+            if k < 0 or code > ranges[k][1]:
+                break
+            t = ranges[k][2]
+        s = t
+        if rules[s] is not None:
+            last_end = i + 1
+            last_rule = rules[s]
+    return last_end, last_rule
+
+
+def tokens(text):
+    # Yields a (token name, lexeme) pair for every lexeme of text that makes a token.
+    position = 0
+    while position < len(text):
+        end, rule = longest_match(text, position)
+        if rule is None:
+            raise Exception(f'Cannot produce a token from this string at position {position}.')
+        if TOKENS[rule] is not None:
+            yield TOKENS[rule], text[position:end]
+        position = end
+'''
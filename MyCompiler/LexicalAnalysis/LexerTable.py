@@ -0,0 +1,97 @@
+from bisect import bisect_right
+
+from DFA import DFA
+from Elements import CharRangeElement
+from States import DFAState
+
+
+class LexerTable:
+    # A flat copy of a lexer's DFA that only holds plain ints and strings so it can be pickled
+    # and shipped to other processes cheaply.
+    # transitions[i] maps a character to the index of the next state, i = 0 is the start state.
+    # ranges[i] is a sorted list of (first, last, next state) for the transitions of state i on
+    # ranges of code points, which is how the DFA holds anything past ASCII. range_starts[i]
+    # has the firsts alone to bisect over.
+    # rules[i] is the index of the pattern state i accepts or None if it isn't accepting.
+    def __init__(self, dfa, rule_of):
+        # rule_of maps an accepting DFA state to the index of the pattern it accepts.
+        assert isinstance(dfa, DFA)
+        states = [dfa.start]
+        index_of = {dfa.start: 0}
+        i = 0
+        while i < len(states):
+            for transition in states[i].outgoing_flat():
+                if transition.target not in index_of:
+                    index_of[transition.target] = len(states)
+                    states.append(transition.target)
+            i += 1
+
+        self.transitions = []
+        self.ranges = []
+        self.range_starts = []
+        self.rules = []
+        for state in states:
+            assert isinstance(state, DFAState)
+            transitions = dict()
+            ranges = []
+            for transition in state.outgoing_flat():
+                if isinstance(transition.element, CharRangeElement):
+                    for first, last in transition.element.value:
+                        ranges.append((first, last, index_of[transition.target]))
+                else:
+                    transitions[transition.element.value] = index_of[transition.target]
+            ranges.sort()
+            self.transitions.append(transitions)
+            self.ranges.append(ranges)
+            self.range_starts.append([first for first, _, _ in ranges])
+            self.rules.append(rule_of(state) if state.accepting else None)
+
+    def range_target(self, s, char):
+        # The state s goes to on char through one of its ranges or None. Only needed when
+        # char isn't in transitions[s].
+        ranges = self.ranges[s]
+        if len(ranges) == 0:
+            return None
+        code = ord(char)
+        k = bisect_right(self.range_starts[s], code) - 1
+        if k >= 0 and code <= ranges[k][1]:
+            return ranges[k][2]
+        return None
+
+    def longest_match(self, text, start=0, stop=None):
+        # Same as DFASimulator.longest_match except that it works directly on a string and never
+        # looks past stop. The last value returned is one past the furthest position the result
+        # depends on: the character the DFA got stuck on, or stop + 1 if it was still alive when
+        # it reached stop since text past stop could have made the match longer.
+        stop = len(text) if stop is None else stop
+        transitions = self.transitions
+        rules = self.rules
+        s = 0
+        last_end = start
+        last_rule = None
+        for i in range(start, stop):
+            t = transitions[s].get(text[i])
+            if t is None:
+                t = self.range_target(s, text[i])
+                if t is None:
+                    return last_end, last_rule, i + 1
+            s = t
+            if rules[s] is not None:
+                last_end = i + 1
+                last_rule = rules[s]
+        return last_end, last_rule, stop + 1
+
+    def scan(self, text, offset=0):
+        # Splits all of text into (start, end, rule) spans, with positions shifted by offset.
+        # Scanning stops early at the first lexeme that either can't be matched or might
+        # have continued past the end of text, which is why the position scanning stopped at
+        # is returned alongside the spans.
+        spans = []
+        position = 0
+        while position < len(text):
+            end, rule, examined = self.longest_match(text, position)
+            if rule is None or examined > len(text):
+                break
+            spans.append((position + offset, end + offset, rule))
+            position = end
+        return spans, position + offset
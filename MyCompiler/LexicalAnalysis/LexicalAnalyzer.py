@@ -1,4 +1,5 @@
 import math
+import multiprocessing
 from inspect import signature
 
 from Tokens import IfToken, ElseToken, ArithmeticOperatorToken, WhileToken, BitwiseOperatorToken, LogicOperatorToken, \
@@ -14,9 +15,13 @@ from Tokens import IfToken, ElseToken, ArithmeticOperatorToken, WhileToken, Bitw
     PlusToken, AsterixToken, DivideToken, PercentToken, LAngleToken, RAngleToken, BitwiseXorToken, BitwiseOrToken, \
     QuestionToken
 from Alphabet import Alphabet
-from Elements import BaseElement, EmptyExpression, EOF
+from DFASimulator import DFASimulator
+from Elements import BaseElement, EmptyExpression
+from FollowposDFABuilder import FollowposDFABuilder
+from LazyDFASimulator import LazyDFASimulator
+from LexerCheckpoints import LexerCheckpoints
+from LexerTable import LexerTable
 from NFA import NFA
-from NFASimulator import NFASimulator
 from RegExpr import RegularDefinition, RegExpr
 from States import NFAState, ProductionState
 from SymbolTable import SymbolTableManager
@@ -24,7 +29,7 @@ from Transition import Transition
 
 
 class LexicalAnalyzer:
-    def __init__(self, symbol_table_manager, regular_definition, translation_rules):
+    def __init__(self, symbol_table_manager, regular_definition, translation_rules, build_NFA=False, lazy_DFA=False):
         # symbol_table is an instance of the SymbolTableManager class
         # regular_definition is an instance of the RegularDefinition class
         # translation_rules is a list of 2-tuples with the following format:
@@ -35,6 +40,13 @@ class LexicalAnalyzer:
         #           lexeme, string corresponding with the current lexeme
         #       Any side effects should be written to the Symbol table.
         #       You can also optionally return a token.
+        # build_NFA picks how the DFA gets built. By default it's built straight from the parse
+        # trees of the regular expressions using followpos. With build_NFA set it goes through
+        # Thompson's construction and the subset construction instead, which leaves the combined
+        # NFA around in self._NFA.
+        # lazy_DFA skips building the full DFA altogether. The Thompson NFA is lexed with a
+        # LazyDFASimulator instead, which only builds the DFA states the input actually visits.
+        # The full DFA is still built the first time something needs a LexerTable.
 
         self.symbol_table_manager = symbol_table_manager
         self.regular_definition = regular_definition
@@ -46,7 +58,12 @@ class LexicalAnalyzer:
         self._d_i_to_action = dict()
         self._orig_NFAs = None
         self._NFA = None
+        self._DFA = None
         self._simulator = None
+        self._lexer_table = None
+        self._build_NFA = build_NFA or lazy_DFA
+        self._lazy_DFA = lazy_DFA
+        self._accepting_priority = None
         self._prepare_automata()
 
     def _verify(self):
@@ -81,6 +98,29 @@ class LexicalAnalyzer:
             self._d_i_to_priority[d_i.value] = priority
             priority += 1
 
+        # Ties between patterns without a translation rule go to whichever was defined first.
+        d_i_to_definition_order = {d_i: i for i, d_i in enumerate(self.regular_definition.regular_expressions)}
+
+        # The earliest translation rule wins when several patterns match the same lexeme. Every
+        # DFA state settles this once while the DFA is built so matching never has to.
+        def accepting_priority(state):
+            return self._d_i_to_priority[state.d_i], d_i_to_definition_order[state.d_i]
+        self._accepting_priority = accepting_priority
+
+        if not self._build_NFA:
+            builder = FollowposDFABuilder()
+            self._orig_NFAs = []
+            for regex in self.regular_definition.regular_expressions:
+                assert isinstance(regex, RegExpr)
+                production_state = ProductionState(
+                    action=self._d_i_to_action.get(regex, lambda a, b: None),
+                    d_i=regex)
+                builder.add(regex, production_state)
+                self._orig_NFAs.append(production_state)
+            self._DFA = builder.build(accepting_priority)
+            self._simulator = DFASimulator(self._DFA)
+            return
+
         # We need to combine all original NFAs into a single one
         root = NFAState('start')
         NFAs = []
@@ -114,40 +154,148 @@ class LexicalAnalyzer:
         alphabet = Alphabet(
             [element for element in alphabet if not isinstance(element.value, RegExpr)])
         self._NFA = NFA(root, alphabet)
-        self._simulator = NFASimulator(self._NFA)
+        if self._lazy_DFA:
+            self._simulator = LazyDFASimulator(self._NFA)
+            return
+        self._DFA = self._NFA.to_DFA(accepting_priority=accepting_priority)
+        self._simulator = DFASimulator(self._DFA)
 
-    def process(self, input_characters):
-        assert isinstance(self._simulator, NFASimulator)
+    def process(self, input_characters, linear_time=False):
+        # With linear_time set the lexer remembers every (DFA state, position) pair that it
+        # learned can't lead to a match, which bounds the total work to O(len(input_characters))
+        # no matter how far each maximal munch has to look ahead before backing off. This costs
+        # some bookkeeping per character so it's meant for inputs we can't trust.
+        # linear_time has no effect with a lazy DFA since its states come and go.
         input_elements = BaseElement.element_list_from_string(input_characters)
-        while len(input_elements) > 0:
-            match_history = []
-            simulator_generator = self._simulator.simulate_gen(input_elements)
-            while not isinstance((accepting_states := next(simulator_generator)), EOF):
-                match_history.append(accepting_states)
-
-            if len(match_history) == 0:
+        failed = set() if linear_time else None
+        position = 0
+        while position < len(input_elements):
+            # Find the longest lexeme starting here, only keeping track of the last place
+            # the DFA accepted and which pattern it accepted.
+            if isinstance(self._simulator, LazyDFASimulator):
+                end, accepting_states = self._simulator.longest_match(input_elements, position)
+                producing_state = min(accepting_states, key=self._accepting_priority, default=None)
+            else:
+                assert isinstance(self._simulator, DFASimulator)
+                end, accepting_state = self._simulator.longest_match(input_elements, position, failed)
+                producing_state = None if accepting_state is None else accepting_state.accepted_state
+            if producing_state is None:
                 raise Exception('Cannot produce a token from this string.')
 
-            accepted_states = None
-            chars_consumed = 0
-            for i, accepting_states in enumerate(reversed(match_history)):
-                # assert isinstance(accepted_states, set)
-                if len(accepting_states) > 0:
-                    accepted_states = list(accepting_states)
-                    chars_consumed = len(match_history) - i
-                    break
+            if token := self._produce_token(producing_state, input_characters[position:end]):
+                yield token
+
+            position = end
+
+    def process_parallel(self, input_characters, processes=None, chunk_size=1 << 16):
+        # Lexes a large input on several processes. The input is cut right after a newline
+        # roughly every chunk_size characters and each chunk is lexed on its own on the
+        # speculation that a lexeme starts there. That's almost always true, but a newline can
+        # also sit inside a string literal, so every seam gets checked while stitching the
+        # chunks back together: we lex from where the previous chunk left off until we land on
+        # the start of a lexeme the worker found, and from there on the worker's lexemes are
+        # exactly the ones lexing sequentially would have found. The translation rules' actions
+        # still run here, in order, since they write to the symbol table.
+        chunks = []
+        start = 0
+        while start < len(input_characters):
+            stop = input_characters.find('\n', start + chunk_size)
+            stop = len(input_characters) if stop == -1 else stop + 1
+            chunks.append((input_characters[start:stop], start))
+            start = stop
+        if len(chunks) <= 1:
+            yield from self.process(input_characters)
+            return
 
-            accepted_states.sort(key=lambda state: self._d_i_to_priority[state.d_i])
-            producing_state = accepted_states.pop(0)
+        table = self.get_lexer_table()
+        position = 0
+        with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(table,)) as pool:
+            for spans, scanned_to in pool.imap(_scan_chunk, chunks):
+                span_index = {span[0]: i for i, span in enumerate(spans)}
+                while position < scanned_to and position not in span_index:
+                    position, token = self._process_one(table, input_characters, position)
+                    if token:
+                        yield token
+                if position in span_index:
+                    for span_start, end, rule in spans[span_index[position]:]:
+                        if token := self._produce_token(self._orig_NFAs[rule], input_characters[span_start:end]):
+                            yield token
+                        position = end
 
-            assert isinstance(producing_state, ProductionState)
-            lexeme_elements = input_elements[:chars_consumed]
-            lexeme = ''.join([element.value for element in lexeme_elements])
-            assert isinstance(self.symbol_table_manager, SymbolTableManager)
-            if token := producing_state.action(self.symbol_table_manager.curr_table(), lexeme):
+        # The final lexeme is always left for us since the last worker can't see past the input
+        while position < len(input_characters):
+            position, token = self._process_one(table, input_characters, position)
+            if token:
                 yield token
 
-            input_elements = input_elements[chars_consumed:]
+    def process_with_checkpoints(self, input_characters):
+        # Lexes all of input_characters and returns LexerCheckpoints, which holds the tokens
+        # along with what relex needs to redo only part of the work after an edit.
+        table = self.get_lexer_table()
+        lexemes = []
+        position = 0
+        while position < len(input_characters):
+            lexeme = self._checkpointed_lexeme(table, input_characters, position)
+            lexemes.append(lexeme)
+            position = lexeme[1]
+        return LexerCheckpoints(input_characters, lexemes)
+
+    def relex(self, checkpoints, start, stop, replacement):
+        # Replaces text[start:stop] with replacement and lexes again only what the edit could
+        # have changed. Lexing resumes at the first lexeme whose scan looked at the edited text
+        # and stops as soon as a lexeme starts past the replacement right where an old one did,
+        # since from there on the old lexemes are exactly what lexing again would produce.
+        # checkpoints is updated in place. Returns (i, replaced, relexed): the old lexemes
+        # starting at index i that were replaced and the ones that replaced them.
+        assert isinstance(checkpoints, LexerCheckpoints)
+        assert 0 <= start <= stop <= len(checkpoints.text)
+        table = self.get_lexer_table()
+        text = checkpoints.text[:start] + replacement + checkpoints.text[stop:]
+        delta = len(replacement) - (stop - start)
+
+        i = checkpoints.restart_index(start)
+        j = len(checkpoints.lexemes)
+        relexed = []
+        position = checkpoints.lexemes[i][0] if i < len(checkpoints.lexemes) else 0
+        while position < len(text):
+            if position >= start + len(replacement):
+                k = checkpoints.index_starting_at(position - delta)
+                if k is not None:
+                    j = k
+                    break
+            lexeme = self._checkpointed_lexeme(table, text, position)
+            relexed.append(lexeme)
+            position = lexeme[1]
+
+        replaced = checkpoints.lexemes[i:j]
+        checkpoints.splice(text, i, j, relexed, delta)
+        return i, replaced, relexed
+
+    def _checkpointed_lexeme(self, table, input_characters, position):
+        end, rule, examined = table.longest_match(input_characters, position)
+        if rule is None:
+            raise Exception('Cannot produce a token from this string.')
+        return position, end, examined, self._produce_token(self._orig_NFAs[rule], input_characters[position:end])
+
+    def _process_one(self, table, input_characters, position):
+        end, rule, _ = table.longest_match(input_characters, position)
+        if rule is None:
+            raise Exception('Cannot produce a token from this string.')
+        return end, self._produce_token(self._orig_NFAs[rule], input_characters[position:end])
+
+    def _produce_token(self, producing_state, lexeme):
+        assert isinstance(producing_state, ProductionState)
+        assert isinstance(self.symbol_table_manager, SymbolTableManager)
+        return producing_state.action(self.symbol_table_manager.curr_table(), lexeme)
+
+    def get_lexer_table(self):
+        # Rules in the table are indexes into self._orig_NFAs.
+        if self._lexer_table is None:
+            if self._DFA is None:
+                self._DFA = self._NFA.to_DFA(accepting_priority=self._accepting_priority)
+            rule_index = {state: i for i, state in enumerate(self._orig_NFAs)}
+            self._lexer_table = LexerTable(self._DFA, lambda state: rule_index[state.accepted_state])
+        return self._lexer_table
 
     @staticmethod
     def basic_expression_lexer():
@@ -372,3 +520,17 @@ class LexicalAnalyzer:
             translation_rules.append((BaseElement(reg_def[name]), getattr(cls, 'lex_action')))
 
         return LexicalAnalyzer(symbol_table_manager, reg_def, translation_rules)
+
+
+# Each worker process gets its own copy of the lexer table once rather than with every chunk.
+_worker_lexer_table = None
+
+
+def _init_worker(lexer_table):
+    global _worker_lexer_table
+    _worker_lexer_table = lexer_table
+
+
+def _scan_chunk(chunk):
+    text, offset = chunk
+    return _worker_lexer_table.scan(text, offset)
@@ -0,0 +1,75 @@
+from LexicalAnalyzer import LexicalAnalyzer
+
+
+class PushLexicalAnalyzer:
+    # Push based front end for a LexicalAnalyzer. Input is handed over a chunk at a time, e.g.
+    # as it arrives over a socket, and feed returns the tokens that are certain so far. A
+    # lexeme is only certain once the DFA can't go any further, so whatever is at the end of
+    # a chunk is held back until more input arrives or close is called. Nothing here ever
+    # blocks, so it can be driven straight from an asyncio protocol or stream reader.
+    def __init__(self, lexical_analyzer):
+        assert isinstance(lexical_analyzer, LexicalAnalyzer)
+        self.lexical_analyzer = lexical_analyzer
+        self._table = lexical_analyzer.get_lexer_table()
+        # _pending holds the input from the start of the current lexeme onward. The scan of that
+        # lexeme is kept between chunks so it is picked up where it left off instead of being
+        # redone from the start of the lexeme every time a chunk arrives.
+        self._pending = ''
+        self._state = 0
+        self._scanned = 0
+        self._last_end = 0
+        self._last_rule = None
+        self.closed = False
+
+    def feed(self, chunk):
+        assert not self.closed, 'No more input can be fed after close.'
+        self._pending += chunk
+        return self._lex(final=False)
+
+    def close(self):
+        # Marks the end of the input and returns the remaining tokens.
+        tokens = self._lex(final=True) if not self.closed else []
+        self.closed = True
+        return tokens
+
+    def _lex(self, final):
+        transitions = self._table.transitions
+        rules = self._table.rules
+        tokens = []
+        start = 0
+        while True:
+            s = self._state
+            i = self._scanned
+            while s is not None and i < len(self._pending):
+                t = transitions[s].get(self._pending[i])
+                s = t if t is not None else self._table.range_target(s, self._pending[i])
+                if s is not None:
+                    i += 1
+                    if rules[s] is not None:
+                        self._last_end = i
+                        self._last_rule = rules[s]
+
+            if s is not None and not final:
+                # The DFA made it to the end of the input we have, the next chunk decides.
+                self._state = s
+                self._scanned = i
+                break
+            if start == len(self._pending):
+                break
+            if self._last_rule is None:
+                raise Exception('Cannot produce a token from this string.')
+
+            if token := self.lexical_analyzer._produce_token(
+                    self.lexical_analyzer._orig_NFAs[self._last_rule],
+                    self._pending[start:self._last_end]):
+                tokens.append(token)
+            start = self._last_end
+            self._state = 0
+            self._scanned = start
+            self._last_rule = None
+
+        # Drop the lexemes we are done with all at once
+        self._pending = self._pending[start:]
+        self._scanned -= start
+        self._last_end -= start
+        return tokens
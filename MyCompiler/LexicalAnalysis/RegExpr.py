@@ -1,10 +1,9 @@
 import copy
 import math
-import string
 
 from Alphabet import Alphabet
 from Elements import BaseElement, QuantifierElement, UnmatchableElement, EscapedCharElement, CharClassElement, \
-    EmptyExpression
+    EmptyExpression, CharRangeElement
 from Enums import RegexOperation, SpecialCharacter, ShorthandCharacterClass, SpecialEscapedCharacter
 from NFAOneStartOneEnd import NFAOneStartOneEnd
 from States import NFAState
@@ -41,253 +40,177 @@ class RegExprParseTree:
 
     @staticmethod
     def build_from_expression(expression):
-        expression = RegExprParseTree.handle_identity(expression)
-        expression = RegExprParseTree.handle_char_class(expression)
-        expression = RegExprParseTree.handle_escaped_special_chars(expression)
-        expression = RegExprParseTree.handle_grouping(expression)
-        expression = RegExprParseTree.handle_quantifiers(expression)
-        expression = RegExprParseTree.handle_concat(expression)
-        expression = RegExprParseTree.handle_union(expression)
-
-        if len(expression) != 1:
+        # Recursive descent over the list of terms, one term at a time:
+        #   union      -> concat ('|' concat)*
+        #   concat     -> quantified quantified*
+        #   quantified -> atom quantifier*
+        #   atom       -> '(' union ')' | '[' class ']' | element
+        # Unions and concatenations associate to the left and quantifiers apply to whatever
+        # comes right before them, so a|b|c is ((a|b)|c), abc is ((ab)c) and a*? is ((a*)?).
+        # Only parentheses recurse, which keeps long expressions off the recursion limit.
+        tree, i = RegExprParseTree._parse_union(expression, 0)
+        if i != len(expression):
             raise Exception('Something went wrong when generating the regex '
                             'parse tree')
-        else:
-            return expression[0]
+        return tree
 
     @staticmethod
-    def handle_identity(expression):
-        new_expression = []
-        for term in expression:
-            if isinstance(term, BaseElement) and not isinstance(term, QuantifierElement):
-                new_expression.append(RegExprParseTree(term, RegexOperation.IDENTITY))
-            else:
-                new_expression.append(term)
-        return new_expression
+    def _parse_union(expression, i):
+        tree, i = RegExprParseTree._parse_concat(expression, i)
+        while i < len(expression) and expression[i] == SpecialCharacter.UNION:
+            right, i = RegExprParseTree._parse_concat(expression, i + 1)
+            tree = RegExprParseTree(tree, RegexOperation.UNION, right)
+        return tree, i
 
     @staticmethod
-    def range_over_chars(start, stop):
-        # Either ranging over letters of numbers
-        assert isinstance(start, str), len(start) == 1
-        assert isinstance(stop, str), len(stop) == 1
-        assert ord(start) <= ord(stop)
-        if start.isdigit() and stop.isdigit() or \
-            start.islower() and stop.islower() or \
-            start.isupper() and stop.isupper():
-            return set([chr(ASCII_num) for ASCII_num in range(ord(start), ord(stop) + 1)])
-        else:
-            raise Exception('Character class must be across letters of the same casing or digits.')
+    def _parse_concat(expression, i):
+        tree, i = RegExprParseTree._parse_quantified(expression, i)
+        while i < len(expression) and \
+                expression[i] != SpecialCharacter.UNION and \
+                expression[i] != SpecialCharacter.RIGHT_PAREN:
+            right, i = RegExprParseTree._parse_quantified(expression, i)
+            tree = RegExprParseTree(tree, RegexOperation.CONCAT, right)
+        return tree, i
 
     @staticmethod
-    def handle_char_class(expression):
-        if len(expression) == 0:
-            return []
-        if len(expression) == 1:
-            return expression
-
-        if expression[0] == SpecialCharacter.LEFT_SQUARE_BRACKET:
-            # Search for the matching close parenthesis and recursively build a tree
-            paren_cnt = 1
-            for i, term in enumerate(expression[1:]):
-                if term == SpecialCharacter.LEFT_SQUARE_BRACKET:
-                    paren_cnt += 1
-                elif term == SpecialCharacter.RIGHT_SQUARE_BRACKET:
-                    paren_cnt -= 1
-
-                if paren_cnt == 0:
-                    # We found the matching close square bracket
-                    expressions_inside_parens = expression[1:(i+1)]
-                    expressions_outside_parens = expression[i+2:]
-
-                    if len(expressions_inside_parens) == 0:
-                        return [UnmatchableElement()]
-
-                    is_negative = False
-
-                    char_list = []
-                    for expression_inside_parens in expressions_inside_parens:
-                        error_str = 'Character classes should only operate on single character ' \
-                                    'strings or shorthand classes.'
-                        if isinstance(expression_inside_parens, SpecialCharacter):
-                            # Special characters have their meaning ignored inside character classes
-                            char_list.append(str(expression_inside_parens))
-                            continue
-                        if isinstance(expression_inside_parens, QuantifierElement):
-                            char_list.append(expression_inside_parens.value)
-                            continue
-
-                        assert isinstance(expression_inside_parens, RegExprParseTree), error_str
-                        assert expression_inside_parens.operation == RegexOperation.IDENTITY, error_str
-                        elem = expression_inside_parens.left
-                        assert isinstance(elem, BaseElement), error_str
-                        assert isinstance(elem, EscapedCharElement) or \
-                               isinstance(elem, CharClassElement) or \
-                               (isinstance(elem.value, str) and len(elem.value) == 1), error_str
-                        char_list.append(elem.value)
-
-                    # look for a minus sign to indicate a range of characters
-                    char_set = set()
-
-                    if char_list[0] == '^':
-                        char_list = char_list[1:]
-                        is_negative = True
-
-                    for idx, char in enumerate(char_list):
-                        if isinstance(char, ShorthandCharacterClass):
-                            char_set.update(char.to_char_set())
-                            continue
-                        elif isinstance(char, SpecialEscapedCharacter):
-                            char_set.add(str(char))
-                        if char == '-':
-                            if idx == 0 or idx == len(char_list) - 1:
-                                # If we see the range indicator at the start or end it's a literal '-'
-                                char_set.add(char)
-                            else:
-                                range_of_chars = RegExprParseTree.range_over_chars(char_list[idx-1], char_list[idx+1])
-                                char_set.update(range_of_chars)
-                        else:
-                            char_set.add(char)
-
-                    # now we have all the characters in this character class
-                    if is_negative:
-                        char_set = set(string.printable).difference(char_set)
-
-                    if len(char_set) == 0:
-                        return [UnmatchableElement()]
+    def _parse_quantified(expression, i):
+        tree, i = RegExprParseTree._parse_atom(expression, i)
+        while i < len(expression) and isinstance(expression[i], QuantifierElement):
+            tree = RegExprParseTree(tree, RegexOperation.QUANTIFIER, expression[i])
+            i += 1
+        return tree, i
 
-                    expression_list = []
-                    for idx, char in enumerate(char_set):
-                        expression_list.append(BaseElement(char))
-                        if idx != len(char_set) - 1:
-                            expression_list.append(SpecialCharacter.UNION)
-
-                    tree_inside_brackets =  RegExprParseTree.build_from_expression(expression_list)
+    @staticmethod
+    def _parse_atom(expression, i):
+        if i == len(expression):
+            raise Exception('Something went wrong when generating the regex '
+                            'parse tree')
+        term = expression[i]
+        if term == SpecialCharacter.LEFT_PAREN:
+            tree, i = RegExprParseTree._parse_union(expression, i + 1)
+            if i == len(expression) or expression[i] != SpecialCharacter.RIGHT_PAREN:
+                raise Exception('Unbalanced parentheses in regex')
+            return RegExprParseTree(tree, RegexOperation.GROUP), i + 1
+        elif term == SpecialCharacter.LEFT_SQUARE_BRACKET:
+            return RegExprParseTree._parse_char_class(expression, i)
+        elif isinstance(term, EscapedCharElement):
+            if term.value == SpecialEscapedCharacter.TAB:
+                return RegExprParseTree(BaseElement('\t'), RegexOperation.IDENTITY), i + 1
+            elif term.value == SpecialEscapedCharacter.NEWLINE:
+                return RegExprParseTree(BaseElement('\n'), RegexOperation.IDENTITY), i + 1
+            else:
+                raise Exception('Unknown escaped special character')
+        elif isinstance(term, CharClassElement):
+            return RegExprParseTree.char_class_tree(RegExprParseTree.shorthand_ranges(term.value)), i + 1
+        elif isinstance(term, BaseElement) and not isinstance(term, QuantifierElement):
+            return RegExprParseTree(term, RegexOperation.IDENTITY), i + 1
+        else:
+            raise Exception('Something went wrong when generating the regex '
+                            'parse tree')
 
-                    return RegExprParseTree.handle_char_class(
-                        [tree_inside_brackets] + expressions_outside_parens)
+    @staticmethod
+    def _parse_char_class(expression, i):
+        # Search for the matching close square bracket
+        paren_cnt = 1
+        j = i + 1
+        while j < len(expression):
+            if expression[j] == SpecialCharacter.LEFT_SQUARE_BRACKET:
+                paren_cnt += 1
+            elif expression[j] == SpecialCharacter.RIGHT_SQUARE_BRACKET:
+                paren_cnt -= 1
+                if paren_cnt == 0:
+                    break
+            j += 1
         else:
-            return [expression[0]] + \
-                   RegExprParseTree.handle_char_class(expression[1:])
+            raise Exception('Unbalanced square brackets in regex')
+
+        if j == i + 1:
+            return RegExprParseTree(UnmatchableElement(), RegexOperation.IDENTITY), j + 1
+
+        char_list = []
+        for term in expression[i + 1:j]:
+            error_str = 'Character classes should only operate on single character ' \
+                        'strings or shorthand classes.'
+            if isinstance(term, SpecialCharacter):
+                # Special characters have their meaning ignored inside character classes
+                char_list.append(str(term))
+                continue
+            if isinstance(term, QuantifierElement):
+                char_list.append(term.value)
+                continue
+
+            assert isinstance(term, BaseElement), error_str
+            assert isinstance(term, EscapedCharElement) or \
+                   isinstance(term, CharClassElement) or \
+                   (isinstance(term.value, str) and len(term.value) == 1), error_str
+            char_list.append(term.value)
+        return RegExprParseTree.char_class_tree(RegExprParseTree.char_class_to_ranges(char_list)), j + 1
 
     @staticmethod
-    def handle_escaped_special_chars(expression):
-        new_expression = []
-        for term in expression:
-            if isinstance(term, RegExprParseTree) and term.operation == RegexOperation.IDENTITY:
-                elem = term.left
-                if isinstance(elem, EscapedCharElement):
-                    if elem.value == SpecialEscapedCharacter.TAB:
-                        new_expression.append(BaseElement('\t'))
-                    elif elem.value == SpecialEscapedCharacter.NEWLINE:
-                        new_expression.append(BaseElement('\n'))
-                    else:
-                        raise Exception('Unknown escaped special character')
-                elif isinstance(elem, CharClassElement):
-                    had_minus = False
-                    had_caret = False
-                    char_set = elem.value.to_char_set()
-                    if '-' in char_set:
-                        had_minus = True
-                        char_set.remove('-')
-                    if '^' in char_set:
-                        had_caret = True
-                        char_set.remove('^')
-                    char_only = [BaseElement(char) for char in char_set]
-                    if had_caret:
-                        char_only.append(BaseElement('^'))
-                    if had_minus:
-                        char_only.append(BaseElement('-'))
-                    elements = [SpecialCharacter.LEFT_SQUARE_BRACKET] + \
-                               char_only + \
-                               [SpecialCharacter.RIGHT_SQUARE_BRACKET]
-                    new_expression.append(RegExprParseTree.build_from_expression(elements))
+    def char_class_to_ranges(char_list):
+        # The characters between square brackets, with a leading ^ negating the class and a -
+        # between two characters meaning every character from one to the other. Returns them
+        # as a CharRangeElement since a negated class holds most of Unicode.
+        is_negative = False
+        char_set = set()
+        ranges = CharRangeElement([])
+
+        if char_list[0] == '^':
+            char_list = char_list[1:]
+            is_negative = True
+
+        for idx, char in enumerate(char_list):
+            if isinstance(char, ShorthandCharacterClass):
+                ranges = ranges.union(RegExprParseTree.shorthand_ranges(char))
+                continue
+            elif isinstance(char, SpecialEscapedCharacter):
+                char_set.add(str(char))
+            if char == '-':
+                if idx == 0 or idx == len(char_list) - 1:
+                    # If we see the range indicator at the start or end it's a literal '-'
+                    char_set.add(char)
                 else:
-                    new_expression.append(RegExprParseTree(elem, RegexOperation.IDENTITY))
+                    range_of_chars = RegExprParseTree.range_over_chars(char_list[idx-1], char_list[idx+1])
+                    char_set.update(range_of_chars)
             else:
-                new_expression.append(term)
-        return RegExprParseTree.handle_identity(new_expression)
+                char_set.add(char)
 
-    @staticmethod
-    def handle_grouping(expression):
-        if len(expression) == 0:
-            return []
-        if len(expression) == 1:
-            return expression
-
-        if expression[0] == SpecialCharacter.LEFT_PAREN:
-            # Search for the matching close parenthesis and recursively build a tree
-            paren_cnt = 1
-            for i, term in enumerate(expression[1:]):
-                if term == SpecialCharacter.LEFT_PAREN:
-                    paren_cnt += 1
-                elif term == SpecialCharacter.RIGHT_PAREN:
-                    paren_cnt -= 1
-
-                if paren_cnt == 0:
-                    # We found the matching close parenthesis
-                    expressions_inside_parens = expression[1:(i+1)]
-                    expressions_outside_parens = expression[i+2:]
-                    tree_inside_parens = RegExprParseTree(
-                        RegExprParseTree.build_from_expression(expressions_inside_parens),
-                        RegexOperation.GROUP)
-                    return RegExprParseTree.handle_grouping(
-                        [tree_inside_parens] + expressions_outside_parens)
-        else:
-            return [expression[0]] + \
-                   RegExprParseTree.handle_grouping(expression[1:])
+        # now we have all the characters in this character class
+        chars = [char for char in char_set if isinstance(char, str) and len(char) == 1]
+        ranges = ranges.union(CharRangeElement.from_chars(chars))
+        if is_negative:
+            ranges = ranges.complement()
+        return ranges
 
     @staticmethod
-    def handle_quantifiers(expression):
-        if len(expression) == 0:
-            return []
-        if len(expression) == 1:
-            return expression
-
-        if isinstance(expression[1], QuantifierElement):
-            quant_target = RegExprParseTree(
-                expression[0],
-                RegexOperation.QUANTIFIER,
-                expression[1])
-            return RegExprParseTree.handle_quantifiers(
-                [quant_target] + expression[2:])
-        else:
-            return [expression[0]] + \
-                   RegExprParseTree.handle_quantifiers(expression[1:])
+    def shorthand_ranges(shorthand):
+        assert isinstance(shorthand, ShorthandCharacterClass)
+        ranges = CharRangeElement.from_chars(shorthand.to_char_set())
+        return ranges.complement() if shorthand.is_negated() else ranges
 
     @staticmethod
-    def handle_union(expression):
-        if len(expression) == 0:
-            return []
-        if len(expression) == 1:
-            return expression
-
-        if expression[1] == SpecialCharacter.UNION:
-            union_target = RegExprParseTree(expression[0], RegexOperation.UNION, expression[2])
-            return RegExprParseTree.handle_union(
-                [union_target] + expression[3:])
-        else:
-            return [expression[0]] + \
-                   RegExprParseTree.handle_union(expression[1:])
+    def char_class_tree(ranges):
+        # A character class is kept as a single CharRangeElement rather than a union with a
+        # branch per character, so it ends up as one transition in the automata.
+        assert isinstance(ranges, CharRangeElement)
+        if ranges.size() == 0:
+            return RegExprParseTree(UnmatchableElement(), RegexOperation.IDENTITY)
+        if ranges.size() == 1:
+            return RegExprParseTree(BaseElement(chr(ranges.value[0][0])), RegexOperation.IDENTITY)
+        return RegExprParseTree(ranges, RegexOperation.IDENTITY)
 
     @staticmethod
-    def handle_concat(expression):
-        if len(expression) == 0:
-            return []
-        if len(expression) == 1:
-            return expression
-
-        if expression[0] != SpecialCharacter.UNION and \
-            expression[1] != SpecialCharacter.UNION:
-            concat_target = RegExprParseTree(expression[0], RegexOperation.CONCAT, expression[1])
-            return RegExprParseTree.handle_concat(
-                [concat_target] + expression[2:])
+    def range_over_chars(start, stop):
+        # Either ranging over letters of numbers
+        assert isinstance(start, str), len(start) == 1
+        assert isinstance(stop, str), len(stop) == 1
+        assert ord(start) <= ord(stop)
+        if start.isdigit() and stop.isdigit() or \
+            start.islower() and stop.islower() or \
+            start.isupper() and stop.isupper():
+            return set([chr(ASCII_num) for ASCII_num in range(ord(start), ord(stop) + 1)])
         else:
-            return [expression[0]] + \
-                   RegExprParseTree.handle_concat(expression[1:])
-
-        # concat_target = RegExprParseTree(expression[0], RegexOperation.CONCAT, expression[1])
-        # return RegExprParseTree.handle_concat(
-        #     [concat_target] + expression[2:])
+            raise Exception('Character class must be across letters of the same casing or digits.')
 
 
 class RegExpr:
@@ -507,55 +430,31 @@ class RegExpr:
             # r = s{1,1}
             elif quantifier.start == 1 and quantifier.stop == 1:
                 return RegExpr.recursive_parse_tree_to_NFA(parse_tree.left)
-            # r = s{0,m}
-            elif quantifier.start == 0:
-                N_s = RegExpr.recursive_parse_tree_to_NFA(parse_tree.left)
-                N_s.stop.accepting = False
-
-                N_s_0_m_minus_1 = RegExpr.recursive_parse_tree_to_NFA(
-                    RegExprParseTree(
-                        parse_tree.left,
-                        RegexOperation.QUANTIFIER,
-                        QuantifierElement(start=0, stop=quantifier.stop - 1)))
-                N_s_0_m_minus_1.stop.accepting = False
-
-
-                start_state = NFAState('i')
-                end_state = NFAState('f', accepting=True)
-
-                start_state.add_outgoing(Transition(EmptyExpression(), N_s_0_m_minus_1.start))
-                start_state.add_outgoing(Transition(EmptyExpression(), N_s.start))
-                start_state.add_outgoing(Transition(EmptyExpression(), end_state))
-
-                N_s_0_m_minus_1.stop.add_outgoing(Transition(EmptyExpression(), N_s.start))
-
-                N_s.stop.add_outgoing(Transition(EmptyExpression(), end_state))
-
-                return NFAOneStartOneEnd(start_state, N_s.alphabet, end_state)
-            # r = s{n,m}
+            # r = s{n,m}: n copies of s one after the other followed by either m - n copies
+            # that can each be skipped to the end or, when m is infinite, by s*. The NFA for s
+            # is only built once and every copy is duplicated from it, which keeps the work
+            # linear in m.
             else:
-                N_s = RegExpr.recursive_parse_tree_to_NFA(parse_tree.left)
-                N_s.stop.accepting = False
-
-                N_s_0_n_minus_1_m_minus_1 = RegExpr.recursive_parse_tree_to_NFA(
-                    RegExprParseTree(
-                        parse_tree.left,
-                        RegexOperation.QUANTIFIER,
-                        QuantifierElement(start=quantifier.start - 1, stop=quantifier.stop - 1)))
-                N_s_0_n_minus_1_m_minus_1.stop.accepting = False
-
+                template = RegExpr.recursive_parse_tree_to_NFA(parse_tree.left)
+                template.stop.accepting = False
+                optional_copies = 1 if quantifier.stop == math.inf else quantifier.stop - quantifier.start
+                count = quantifier.start + optional_copies
+                copies = [template.duplicate() for _ in range(count - 1)] + [template] if count > 0 else []
 
                 start_state = NFAState('i')
                 end_state = NFAState('f', accepting=True)
-
-                start_state.add_outgoing(
-                    Transition(EmptyExpression(), N_s_0_n_minus_1_m_minus_1.start))
-
-                N_s_0_n_minus_1_m_minus_1.stop.add_outgoing(Transition(EmptyExpression(), N_s.start))
-
-                N_s.stop.add_outgoing(Transition(EmptyExpression(), end_state))
-
-                return NFAOneStartOneEnd(start_state, N_s.alphabet, end_state)
+                current = start_state
+                for N_s in copies[:quantifier.start]:
+                    current.add_outgoing(Transition(EmptyExpression(), N_s.start))
+                    current = N_s.stop
+                for N_s in copies[quantifier.start:]:
+                    current.add_outgoing(Transition(EmptyExpression(), end_state))
+                    current.add_outgoing(Transition(EmptyExpression(), N_s.start))
+                    if quantifier.stop == math.inf:
+                        N_s.stop.add_outgoing(Transition(EmptyExpression(), N_s.start))
+                    current = N_s.stop
+                current.add_outgoing(Transition(EmptyExpression(), end_state))
+                return NFAOneStartOneEnd(start_state, template.alphabet, end_state)
         # r = (s)
         elif parse_tree.operation == RegexOperation.GROUP:
             return RegExpr.recursive_parse_tree_to_NFA(parse_tree.left)
@@ -1,6 +1,7 @@
 import copy
 import re
 import os
+from Enums import Associativity, LRAction
 from Tokens import EmptyToken
 from Nonterminal import Nonterminal
 from Terminal import Terminal, epsilon_terminal
@@ -10,7 +11,8 @@ from LR0Item import LR0Item
 
 
 class BaseGrammar:
-    def __init__(self, terminals, nonterminals, productions, start_symbol, prev_start_symbol=None):
+    def __init__(self, terminals, nonterminals, productions, start_symbol, prev_start_symbol=None,
+                 precedence=None, production_precedence=None):
         assert isinstance(terminals, set)
         assert isinstance(nonterminals, set)
         assert isinstance(productions, dict)
@@ -18,6 +20,11 @@ class BaseGrammar:
         self.nonterminals = nonterminals  # A set of nonterminals
         self.productions = productions  # A dictionary of nonterminals to lists of terminals/nonterminals
         self.start_symbol = start_symbol  # The starting point for all derivations from this grammar
+        # A dictionary of terminals to (level, Associativity), higher levels binding tighter,
+        # and of (A, production) to the terminal whose precedence the production takes instead
+        # of its own, see production_precedence_of.
+        self.precedence = precedence if precedence is not None else dict()
+        self.production_precedence = production_precedence if production_precedence is not None else dict()
         self._verify()
         self._first_cache = None
         self._follow_cache = None
@@ -106,7 +113,9 @@ class BaseGrammar:
             nonterminals=new_nonterminals,
             productions=new_productions,
             start_symbol=new_start_symbol,
-            prev_start_symbol=self._prev_start_symbol)
+            prev_start_symbol=self._prev_start_symbol,
+            precedence=copy.copy(self.precedence),
+            production_precedence=copy.copy(self.production_precedence))
         new_grammar._prev_start_symbol = self._prev_start_symbol
         return new_grammar
 
@@ -119,13 +128,32 @@ class BaseGrammar:
         # A single production rule must be contained on 1 line.
         # All terminals and non terminals are separated by whitespace.
         # Start symbol is the first nonterminal defined.
+        # Precedence is declared like in yacc, on a line of its own: %left, %right or %nonassoc
+        # followed by terminals. Terminals declared on later lines bind tighter. A production
+        # takes the precedence of its last terminal that has one, unless it ends in %prec and a
+        # terminal, which can also be one that only exists to name a precedence level.
         start_symbol = None
         productions = dict()
+        precedence = dict()
+        production_precedence = dict()
         current_nonterminal = None
         for line in grammar_as_string.split('\n'):
             rest_of_line = line.strip()
             if len(rest_of_line) == 0:
                 continue
+            if m := re.match(r'^%(left|right|nonassoc)\s(.*)$', rest_of_line):
+                associativity = {
+                    'left': Associativity.LEFT,
+                    'right': Associativity.RIGHT,
+                    'nonassoc': Associativity.NONASSOC,
+                }[m.group(1)]
+                level = len({level for level, _ in precedence.values()}) + 1
+                terminal_strs = re.findall(r"'([^']+?)'", m.group(2))
+                if len(terminal_strs) == 0:
+                    raise Exception('Expected terminals after %' + m.group(1))
+                for terminal_str in terminal_strs:
+                    precedence[Terminal(terminal_str)] = (level, associativity)
+                continue
             if m := re.match(r'^(\w+)\s*->(.*)$', rest_of_line):
                 # This is a definition of a nonterminal, let's figure out its name
                 current_nonterminal = Nonterminal(m.group(1))
@@ -139,9 +167,14 @@ class BaseGrammar:
                 continue
 
             current_rule = []
+            current_prec = None
             # Let's keep grabbing productions rules from the string until none remain
             while len(rest_of_line) > 0:
-                if m := re.match(r'^(\w+)(.*)$', rest_of_line):
+                if m := re.match(r'^%prec\s+\'([^\']+?)\'(.*)$', rest_of_line):
+                    # The precedence of this production
+                    current_prec = Terminal(m.group(1))
+                    rest_of_line = m.group(2).strip()
+                elif m := re.match(r'^(\w+)(.*)$', rest_of_line):
                     # Found nonterminal
                     current_rule.append(Nonterminal(m.group(1)))
                     rest_of_line = m.group(2).strip()
@@ -159,19 +192,54 @@ class BaseGrammar:
                 elif m := re.match(r'^\|(.*)$', rest_of_line):
                     # shorthand for starting up another production on this line
                     productions.setdefault(current_nonterminal, []).append(tuple(current_rule))
+                    if current_prec is not None:
+                        production_precedence[(current_nonterminal, tuple(current_rule))] = current_prec
                     current_rule = []
+                    current_prec = None
                     rest_of_line = m.group(1).strip()
                 else:
                     raise Exception('Expected a nonterminal, terminal or | before "' + str(rest_of_line) + '"')
 
             productions.setdefault(current_nonterminal, []).append(tuple(current_rule))
+            if current_prec is not None:
+                production_precedence[(current_nonterminal, tuple(current_rule))] = current_prec
         nonterminals = set(productions.keys())
         all_rhs_symbols = set([symbol
                                for productions_for_rule in productions.values()
                                for production in productions_for_rule
                                for symbol in production])
         terminals = all_rhs_symbols.difference(nonterminals)
-        return BaseGrammar(terminals, nonterminals, productions, start_symbol)
+        return BaseGrammar(terminals, nonterminals, productions, start_symbol,
+                           precedence=precedence, production_precedence=production_precedence)
+
+    def production_precedence_of(self, A, production):
+        # The (level, Associativity) of the production A -> production or None if it has none
+        if (A, production) in self.production_precedence:
+            return self.precedence.get(self.production_precedence[(A, production)])
+        for X in reversed(production):
+            if isinstance(X, Terminal) and X in self.precedence:
+                return self.precedence[X]
+        return None
+
+    def resolve_by_precedence(self, A, production, a):
+        # Settles a conflict between reducing by A -> production and shifting a the way yacc
+        # does: the one with the higher precedence wins and on the same level the
+        # associativity decides, left reducing, right shifting and nonassoc making it an
+        # error. Returns the LRAction to take or None if either has no precedence.
+        production_precedence = self.production_precedence_of(A, production)
+        if production_precedence is None or a not in self.precedence:
+            return None
+        production_level, associativity = production_precedence
+        a_level, _ = self.precedence[a]
+        if production_level > a_level:
+            return LRAction.REDUCE
+        if production_level < a_level:
+            return LRAction.SHIFT
+        return {
+            Associativity.LEFT: LRAction.REDUCE,
+            Associativity.RIGHT: LRAction.SHIFT,
+            Associativity.NONASSOC: LRAction.ERROR,
+        }[associativity]
 
     def without_left_recursion(self):
         new_grammar = copy.copy(self)
@@ -304,58 +372,141 @@ class BaseGrammar:
         if isinstance(symbol_string, Terminal) or isinstance(symbol_string, Nonterminal):
             return self._first_cache[symbol_string]
 
-        if symbol_string in self._first_cache:
-            return self._first_cache[tuple(symbol_string)]
+        # Strings aren't cached, there's no end to them. FIRST of what follows a position in a
+        # production is precomputed, see first_of_suffix.
+        return self._terminals_of(self._first_bits_of_string(symbol_string))
 
-        first = set()
+    def first_of_suffix(self, A, production, position):
+        # FIRST(production[position:]) for the production A -> production, looked up in the
+        # table compute_all_first fills in for every position of every production.
+        if self._first_cache == None:
+            self.compute_all_first()
+        p = self._production_index[(A, production)]
+        first = self._suffix_first_sets[p][position]
+        if first is None:
+            first = self._suffix_first_sets[p][position] = self._terminals_of(self._suffix_first[p][position])
+        return first
 
+    def _number_terminals(self):
+        # Sets of terminals are worked out as ints: bit i is set when self._terminal_list[i] is
+        # in the set. Bit 0 is always ε, which is how nullable symbols are told apart.
+        self._terminal_list = [epsilon_terminal]
+        self._terminal_bit = {epsilon_terminal: 1}
+        symbols = set(self.terminals)
+        for productions in self.productions.values():
+            for production in productions:
+                symbols.update(X for X in production if isinstance(X, Terminal))
+        symbols.add(Terminal(string='$'))
+        for terminal in sorted(symbols):
+            self._bit_of(terminal)
+
+    def _bit_of(self, terminal):
+        # Terminals that aren't in the grammar, like the lookaheads of LR(1) items, get a bit
+        # the first time they're seen.
+        bit = self._terminal_bit.get(terminal)
+        if bit is None:
+            bit = self._terminal_bit[terminal] = 1 << len(self._terminal_list)
+            self._terminal_list.append(terminal)
+        return bit
+
+    def _terminals_of(self, bits):
+        terminals = set()
+        while bits:
+            lowest = bits & -bits
+            terminals.add(self._terminal_list[lowest.bit_length() - 1])
+            bits ^= lowest
+        return terminals
+
+    def _first_bits_of_string(self, symbol_string):
+        # FIRST(X_1 X_2 ... X_n) as bits, with the ε bit set when every X_i is nullable
+        first = 0
         for X_i in symbol_string:
-            first.update(self._first_cache[X_i].difference({epsilon_terminal}))
-            if epsilon_terminal not in self._first_cache[X_i]:
+            X_i_first = self._first_bits[X_i] if isinstance(X_i, Nonterminal) else self._bit_of(X_i)
+            first |= X_i_first & ~1
+            if not X_i_first & 1:
                 # ε not in X_i so X_i+1 can't contribute to FIRST(symbol_string)
-                break
-        else:
-            # We made it here which means ε was in all X_i
-            first.add(epsilon_terminal)
-
-        self._first_cache[tuple(symbol_string)] = first
-        return first
+                return first
+        # We made it here which means ε was in all X_i
+        return first | 1
 
     def compute_all_first(self):
+        # X is nullable when it has a production whose symbols are all nullable, ε being the
+        # only nullable terminal. Every production keeps count of how many of its symbols
+        # aren't known to be nullable yet, so each production is only looked at again when one
+        # of its symbols turns out to be nullable.
+        # FIRST(X) is then the terminals that start some production X -> Y_1 ... Y_k after a
+        # nullable Y_1 ... Y_i-1, plus FIRST(Y_i) for every such nonterminal Y_i, which is
+        # solved with _digraph over those Y_i.
+        self._number_terminals()
+        nonterminals = sorted(self.nonterminals)
+        index = {A: i for i, A in enumerate(nonterminals)}
+
+        nullable = [False] * len(nonterminals)
+        remaining = []
+        occurrences = [[] for _ in nonterminals]
+        worklist = []
+        for A in nonterminals:
+            for production in self.productions.get(A, []):
+                p = len(remaining)
+                count = 0
+                for X in production:
+                    if isinstance(X, Nonterminal):
+                        occurrences[index[X]].append((p, index[A]))
+                        count += 1
+                    elif X != epsilon_terminal:
+                        count = None
+                        break
+                remaining.append(count)
+                if count == 0 and not nullable[index[A]]:
+                    nullable[index[A]] = True
+                    worklist.append(index[A])
+        while len(worklist) > 0:
+            for p, i in occurrences[worklist.pop()]:
+                if remaining[p] is not None:
+                    remaining[p] -= 1
+                    if remaining[p] == 0 and not nullable[i]:
+                        nullable[i] = True
+                        worklist.append(i)
+
+        first = [1 if nullable[i] else 0 for i in range(len(nonterminals))]
+        edges = [[] for _ in nonterminals]
+        for A in nonterminals:
+            for production in self.productions.get(A, []):
+                for X in production:
+                    if isinstance(X, Nonterminal):
+                        edges[index[A]].append(index[X])
+                        if not nullable[index[X]]:
+                            break
+                    elif X != epsilon_terminal:
+                        first[index[A]] |= self._terminal_bit[X]
+                        break
+        # The ε bit must only come from A's own nullability, not from the Y_i it reaches
+        for i, bits in enumerate(self._digraph(edges, [bits & ~1 for bits in first])):
+            first[i] = bits | (first[i] & 1)
+
+        self._first_bits = {A: first[index[A]] for A in nonterminals}
         self._first_cache = dict()
-
-        # If X is a terminal, then FIRST(X) = {X}.
-        for terminal in self.terminals:
+        for terminal, bit in self._terminal_bit.items():
             self._first_cache[terminal] = {terminal}
-
-        # If X -> ε is a production, then add ε to FIRST(X).
-        for nonterminal in self.nonterminals:
-            for productions in self.productions[nonterminal]:
-                if len(productions) == 1 and productions[0] == epsilon_terminal:
-                    self._first_cache[nonterminal] = {epsilon_terminal}
-                    break
-            else:
-                self._first_cache[nonterminal] = set()
-
-        changed = True
-        while changed:
-            changed = False
-            for X in self.nonterminals:
-                for productions in self.productions[X]:
-                    for Y_i in productions:
-                        before = len(self._first_cache[X])
-                        self._first_cache[X].update(self._first_cache[Y_i].difference({epsilon_terminal}))
-                        if len(self._first_cache[X]) != before:
-                            changed = True
-
-                        if epsilon_terminal not in self._first_cache[Y_i]:
-                            # ε not in Y_i so Y_i+1 can't contribute to FIRST(X)
-                            break
-                    else:
-                        # We made it here which means ε was in all Y_i
-                        if epsilon_terminal not in self._first_cache[X]:
-                            self._first_cache[X].add(epsilon_terminal)
-                            change = True
+        for A in nonterminals:
+            self._first_cache[A] = self._terminals_of(self._first_bits[A])
+
+        # Productions are numbered and _suffix_first[p][i] is FIRST(X_i+1 ... X_n) of
+        # production p as bits, worked out from the right. The sets first_of_suffix returns are
+        # only made from the bits when they're asked for.
+        self._production_index = dict()
+        self._suffix_first = []
+        self._suffix_first_sets = []
+        for A in nonterminals:
+            for production in self.productions.get(A, []):
+                suffix_first = [1] * (len(production) + 1)
+                for i in range(len(production) - 1, -1, -1):
+                    X = production[i]
+                    X_first = self._first_bits[X] if isinstance(X, Nonterminal) else self._terminal_bit[X]
+                    suffix_first[i] = X_first & ~1 | (suffix_first[i + 1] if X_first & 1 else 0)
+                self._production_index[(A, tuple(production))] = len(self._suffix_first)
+                self._suffix_first.append(suffix_first)
+                self._suffix_first_sets.append([None] * len(suffix_first))
 
     def follow(self, X):
         assert isinstance(X, Nonterminal)
@@ -365,44 +516,71 @@ class BaseGrammar:
         return self._follow_cache[X]
 
     def compute_all_follow(self):
-        self._follow_cache = dict()
-        for A in self.nonterminals:
-            self._follow_cache[A] = set()
-        self._follow_cache[self.start_symbol].add(Terminal(string='$'))
-
+        # For every production A -> α B β, FOLLOW(B) holds FIRST(β) except ε, and all of
+        # FOLLOW(A) when β is nullable. FIRST(β) is in the suffix table compute_all_first
+        # fills in and the second part is solved with _digraph over the B -> A edges. $ is in
+        # FOLLOW of the start symbol.
+        if self._first_cache == None:
+            self.compute_all_first()
+        nonterminals = sorted(self.nonterminals)
+        index = {A: i for i, A in enumerate(nonterminals)}
+        follow = [0] * len(nonterminals)
+        follow[index[self.start_symbol]] |= self._terminal_bit[Terminal(string='$')]
+        edges = [[] for _ in nonterminals]
+        for A in nonterminals:
+            for production in self.productions.get(A, []):
+                suffix_first = self._suffix_first[self._production_index[(A, tuple(production))]]
+                for i, X in enumerate(production):
+                    if isinstance(X, Nonterminal):
+                        follow[index[X]] |= suffix_first[i + 1] & ~1
+                        if suffix_first[i + 1] & 1:
+                            edges[index[X]].append(index[A])
+
+        follow = self._digraph(edges, follow)
+        self._follow_cache = {A: self._terminals_of(follow[index[A]]) for A in nonterminals}
 
-        changed = True
-        while changed:
-            changed = False
-            for A in self.nonterminals:
-                # If there is a production A -> α B β, then everything in FIRST(β) except ε
-                # is in FOLLOW(B)
-                for production in self.productions[A]:
-                    for i in range(len(production)):
-                        B = production[i]
-                        if isinstance(B, Terminal):
-                            continue
-                        # alpha = production[:i] # not actually used
-                        beta = production[(i+1):]
-                        before = len(self._follow_cache[B])
-                        self._follow_cache[B].update(self.first(beta).difference({epsilon_terminal}))
-                        if len(self._follow_cache[B]) != before:
-                            changed = True
-
-                # If there is a production A -> α B, or a production A -> α B β, where
-                # FIRST(β) contains ε, then everything in FOLLOW(A) is in FOLLOW(B)
-                for production in self.productions[A]:
-                    for i in range(len(production)):
-                        B = production[i]
-                        if isinstance(B, Terminal):
-                            continue
-                        # alpha = production[:i] # not actually used
-                        beta = production[(i+1):]
-                        if epsilon_terminal in self.first(beta):
-                            before = len(self._follow_cache[B])
-                            self._follow_cache[B].update(self._follow_cache[A])
-                            if len(self._follow_cache[B]) != before:
-                                changed = True
+    @staticmethod
+    def _digraph(edges, F):
+        # DeRemer and Pennello's digraph algorithm: given a relation x -> y (edges[x] lists the
+        # y) and a set F'(x) for every x, returns F(x), the union of F'(y) for every y reachable
+        # from x, x itself included. The strongly connected components are found on the way,
+        # Tarjan style, and every x in one gets the same set, so each edge is followed once.
+        # It's recursive on paper, here the recursion is kept on an explicit stack so long chains
+        # of nonterminals don't hit the recursion limit.
+        F = list(F)
+        N = [0] * len(F)
+        done = len(F) + 1
+        stack = []
+        for x_0 in range(len(F)):
+            if N[x_0] != 0:
+                continue
+            stack.append(x_0)
+            N[x_0] = len(stack)
+            calls = [(x_0, len(stack), iter(edges[x_0]))]
+            while len(calls) > 0:
+                x, d, remaining = calls[-1]
+                for y in remaining:
+                    if N[y] == 0:
+                        stack.append(y)
+                        N[y] = len(stack)
+                        calls.append((y, len(stack), iter(edges[y])))
+                        break
+                    N[x] = min(N[x], N[y])
+                    F[x] |= F[y]
+                else:
+                    calls.pop()
+                    if N[x] == d:
+                        while True:
+                            top = stack.pop()
+                            N[top] = done
+                            F[top] = F[x]
+                            if top == x:
+                                break
+                    if len(calls) > 0:
+                        parent = calls[-1][0]
+                        N[parent] = min(N[parent], N[x])
+                        F[parent] |= F[x]
+        return F
 
     def closure(self, I):
         assert isinstance(I, LRItemGroup)
@@ -518,5 +696,8 @@ class BaseGrammar:
         self.productions[new_start] = [(old_start, )]
         self.nonterminals.add(new_start)
         self._is_augmented = True
+        # FIRST and FOLLOW are numbered by production, which now includes S' -> S
+        self._first_cache = None
+        self._follow_cache = None
         self._prev_start_symbol = old_start
         self.start_symbol = new_start
@@ -3,7 +3,7 @@ from LRItemGroup import LRItemGroup
 from BaseGrammar import BaseGrammar
 from Nonterminal import Nonterminal
 from LR1Item import LR1Item
-from Terminal import Terminal, end_terminal
+from Terminal import Terminal, end_terminal, epsilon_terminal
 
 
 class LR1Grammar(BaseGrammar):
@@ -41,8 +41,13 @@ class LR1Grammar(BaseGrammar):
                 beta = production[(item.dot_position + 1):]
                 a = item.lookahead
                 if isinstance(B, Nonterminal):
+                    # FIRST(β a) is FIRST(β) with a in place of ε
+                    first_beta_a = self.first_of_suffix(A, production, item.dot_position + 1)
+                    if epsilon_terminal in first_beta_a:
+                        first_beta_a = first_beta_a.difference({epsilon_terminal})
+                        first_beta_a.add(a)
                     for gamma in self.productions[B]:
-                        for b in self.first((*beta, a)):
+                        for b in first_beta_a:
                             closure.add(
                                 LR1Item(
                                 A=B,
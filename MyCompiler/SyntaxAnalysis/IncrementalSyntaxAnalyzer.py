@@ -0,0 +1,141 @@
+from Enums import LRAction
+from LexicalAnalyzer import LexicalAnalyzer
+from Nonterminal import Nonterminal
+from ParseTree import ParseTree
+from SLR1Parser import SLR1Parser
+from Terminal import Terminal, end_terminal
+
+
+class IncrementalSyntaxAnalyzer:
+    # Keeps the lexemes and parse tree of a piece of text around so that after an edit only the
+    # part that changed has to be lexed and parsed again, along the lines of Wagner and Graham's
+    # incremental LR parsing:
+    #   - Lexing is redone with LexicalAnalyzer.relex, which only rescans around the edit.
+    #   - Every node of the tree remembers the LR state the parser was in right before its first
+    #     token and how many tokens it spans. An old subtree can be pushed on the stack as a
+    #     whole (followed by goto on its symbol) when the parser is in that same state at that
+    #     same token, none of its tokens changed and the token after it didn't change either,
+    #     since those are all the parser ever looked at while building it.
+    # Splicing the lists of lexemes and tokens is still proportional to the size of the text,
+    # but scanning, running the lexer's actions and making parser moves only happen around the
+    # edit.
+    def __init__(self, lexer, parser):
+        assert isinstance(lexer, LexicalAnalyzer)
+        assert isinstance(parser, SLR1Parser)
+        self.lexer = lexer
+        self.parser = parser
+        self.checkpoints = None
+        self.tree = None
+        self._tokens = []
+        # How many lexemes were scanned and how many tokens were covered by reused subtrees
+        # the last time around.
+        self.relexed_count = 0
+        self.reused_count = 0
+
+    @property
+    def text(self):
+        return self.checkpoints.text
+
+    def process(self, text):
+        # Lexes and parses text from scratch.
+        self.checkpoints = self.lexer.process_with_checkpoints(text)
+        self._tokens = self.checkpoints.tokens()
+        self.relexed_count = len(self.checkpoints.lexemes)
+        self.reused_count = 0
+        self.tree = self._parse(self._tokens)
+        return self.tree
+
+    def edit(self, start, stop, replacement):
+        # Replaces text[start:stop] with replacement and returns the new parse tree.
+        assert self.tree is not None, 'Process the original text first.'
+        i, replaced, relexed = self.lexer.relex(self.checkpoints, start, stop, replacement)
+
+        # Old tokens [p, q) were replaced by the new tokens.
+        p = sum(1 for lexeme in self.checkpoints.lexemes[:i] if lexeme[3] is not None)
+        q = p + sum(1 for lexeme in replaced if lexeme[3] is not None)
+        new_tokens = [lexeme[3] for lexeme in relexed if lexeme[3] is not None]
+        self.relexed_count = len(relexed)
+        if p == q and len(new_tokens) == 0:
+            # Only whitespace or comments changed, the tree stays the same.
+            self.reused_count = len(self._tokens)
+            return self.tree
+
+        old_tree = self.tree
+        self._tokens = self._tokens[:p] + new_tokens + self._tokens[q:]
+        self.reused_count = 0
+        self.tree = self._parse(self._tokens, old_tree, p, q, len(new_tokens))
+        return self.tree
+
+    def _parse(self, tokens, old_tree=None, p=0, q=0, r=0):
+        # Same moves as SLR1Parser.consume but building the tree as we go and, given the old
+        # tree where old tokens [p, q) were replaced by r new ones, skipping over whatever
+        # subtrees of it can be reused.
+        parsing_table = self.parser._parsing_table
+        stack = [(parsing_table.start_state, None)]
+        # Path from the root of the old tree down to the last token we looked for. Tokens are
+        # looked for from left to right so each lookup picks up where the previous one left off.
+        path = [(old_tree, 0)] if old_tree is not None else None
+        j = 0
+        while True:
+            s = stack[-1][0]
+            if old_tree is not None:
+                # Where this token was in the old token list, if it was there at all
+                o = j if j < p else j - r + (q - p) if j >= p + r else None
+                if o is not None and (node := self._find_reusable(path, o, s, p, q)) is not None:
+                    stack.append((parsing_table.goto(s, node.symbol), node))
+                    j += node.token_count
+                    self.reused_count += node.token_count
+                    continue
+
+            a = Terminal(token=tokens[j]) if j < len(tokens) else end_terminal
+            action, data = parsing_table.action(s, a)
+            if action == LRAction.SHIFT:
+                node = ParseTree(a.token)
+                node.token_count = 1
+                node.state = s
+                stack.append((data, node))
+                j += 1
+            elif action == LRAction.REDUCE:
+                item = data
+                children = [stack.pop(-1)[1] for _ in item.production]
+                children.reverse()
+                t = stack[-1][0]
+                node = ParseTree(item.A)
+                node.children = children
+                node.token_count = sum(child.token_count for child in children)
+                node.state = t
+                stack.append((parsing_table.goto(t, item.A), node))
+            elif action == LRAction.ACCEPT:
+                return stack[-1][1]
+            elif action == LRAction.ERROR:
+                raise Exception(f'Syntax error at {a}')
+            else:
+                raise Exception('Unknown action.')
+
+    @staticmethod
+    def _find_reusable(path, o, s, p, q):
+        # Looks for the largest subtree of the old tree that starts at old token o, was started
+        # in state s and can be reused. path is a list of (node, offset of its first token)
+        # going down from the root which is moved over to token o.
+        while len(path) > 1 and path[-1][1] + path[-1][0].token_count <= o:
+            path.pop(-1)
+        while True:
+            node, offset = path[-1]
+            for child in node.children:
+                if o < offset + child.token_count:
+                    path.append((child, offset))
+                    break
+                offset += child.token_count
+            else:
+                break
+
+        k = len(path)
+        while k > 0 and path[k - 1][1] == o:
+            k -= 1
+        for node, offset in path[k:]:
+            if isinstance(node.symbol, Nonterminal) and node.state is s:
+                # Either the subtree and the token after it come before the edit or the whole
+                # thing comes after it.
+                if offset + node.token_count < p or offset >= q:
+                    return node
+        return None
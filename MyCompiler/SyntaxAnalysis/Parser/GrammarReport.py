@@ -0,0 +1,277 @@
+import argparse
+import time
+import tracemalloc
+from collections import deque
+
+from ActionCandidates import ActionCandidates
+from BaseGrammar import BaseGrammar
+from Enums import LRAction
+from GrammarFileLoader import GrammarFileLoader
+from LR0Item import LR0Item
+from LR1Grammar import LR1Grammar
+from LRConflict import LRConflict
+from Nonterminal import Nonterminal
+from Terminal import Terminal
+
+
+class GrammarReport:
+    # Works out what the SLR(1), LALR(1) and canonical LR(1) tables of a grammar would look
+    # like without building any of them: how many states there are, how full ACTION and GOTO
+    # would be and every conflict a table would run into, along with how long each phase took.
+    # The collections of items are built the same way the parsing tables build them and the
+    # ACTION entries are found and settled with the same ActionCandidates, so the entries are
+    # keyed by token class and precedence settles the same conflicts as in the tables.
+    # Each conflict comes with the shortest viable prefix that reaches its state, i.e. the
+    # symbols on the stack when the parser gets there, followed by the lookahead it can't
+    # decide on.
+    # The LALR collection is made from the LR(1) one by merging the states with the same core,
+    # the way SpaceConsumingLALRParsingTable does, so the LR(1) collection is only built once
+    # when both are asked for.
+    # Tracing allocations slows the phases down several times over, so they are timed without
+    # it. With measure_memory, everything is then built once more from a fresh copy of the
+    # grammar under tracemalloc to find the peak memory of each phase.
+    def __init__(self, grammar, measure_memory=False):
+        assert isinstance(grammar, BaseGrammar)
+        self.grammar = grammar
+        self.measure_memory = measure_memory
+        # The LR(1) collection of the timed and the traced pass
+        self._LR1_collections = dict()
+
+    def analyze(self, kind):
+        # Returns a dict with the phases as (name, seconds, peak bytes or None), the state
+        # count, the number of ACTION and GOTO entries and their density, and the conflicts.
+        result = self._analyze(kind, traced=False)
+        if self.measure_memory:
+            traced_phases = self._analyze(kind, traced=True)['phases']
+            result['phases'] = [(name, seconds, peak) for (name, seconds, _), (_, _, peak)
+                                in zip(result['phases'], traced_phases)]
+        return result
+
+    def _analyze(self, kind, traced):
+        phases = []
+        if kind == 'SLR1':
+            grammar = self._copy_grammar(BaseGrammar)
+            states, transitions, start, IDs = self._collection(grammar, phases, traced)
+            self._measure(phases, 'FOLLOW', lambda: [grammar.follow(A) for A in grammar.nonterminals], traced)
+            lookaheads = lambda item: grammar.follow(item.A)
+        elif kind == 'LR1':
+            grammar, states, transitions, start, IDs = self._LR1(phases, traced)
+            lookaheads = lambda item: (item.lookahead,)
+        elif kind == 'LALR':
+            grammar, LR1_states, LR1_transitions, LR1_start, _ = self._LR1(phases, traced)
+            states, transitions, start, IDs = self._measure(
+                phases, 'merge cores', lambda: self._merge_cores(LR1_states, LR1_transitions, LR1_start), traced)
+            lookaheads = lambda item: (item.lookahead,)
+        else:
+            raise Exception(f'Unknown parser kind {kind}')
+
+        actions = self._measure(
+            phases, 'actions', lambda: self._actions(grammar, states, transitions, lookaheads), traced)
+        conflicts = []
+        for (i, token), candidates in sorted(actions.items(), key=lambda entry: (entry[0][0], entry[0][1].__name__)):
+            if len(candidates) > 1:
+                conflicts.append(self._conflict(grammar, states, transitions, start, IDs, LRConflict(i, token, candidates)))
+
+        terminals = {token for _, token in actions}
+        goto_entries = sum(1 for i in range(len(states)) for X in transitions[i] if isinstance(X, Nonterminal))
+        return {
+            'kind': kind,
+            'phases': phases,
+            'states': len(states),
+            'action_entries': len(actions),
+            'action_density': len(actions) / max(1, len(states) * len(terminals)),
+            'goto_entries': goto_entries,
+            'goto_density': goto_entries / max(1, len(states) * len(grammar.nonterminals)),
+            'conflicts': conflicts,
+        }
+
+    def format(self, results):
+        lines = []
+        for result in results:
+            lines.append(f"{result['kind']}: {result['states']} states, {len(result['conflicts'])} conflicts")
+            for name, seconds, peak in result['phases']:
+                memory = '' if peak is None else f' {peak / 1024:9.0f} KiB peak'
+                lines.append(f'  {name:<12} {seconds:9.3f}s{memory}')
+            lines.append(f"  ACTION {result['action_entries']} entries, {result['action_density']:.1%} full")
+            lines.append(f"  GOTO   {result['goto_entries']} entries, {result['goto_density']:.1%} full")
+            for conflict in result['conflicts']:
+                lines.append(f"  {conflict['type']} conflict in state {conflict['state']} on {conflict['lookahead']}")
+                lines.append(f"    after: {' '.join(str(X) for X in conflict['prefix'])} . {conflict['lookahead']}")
+                for action, item in conflict['actions']:
+                    lines.append(f'    {action}: {item}')
+        return '\n'.join(lines)
+
+    def _copy_grammar(self, grammar_class):
+        # The grammar of every kind is a fresh one since augmenting it and building its items
+        # changes it in place.
+        return grammar_class(
+            terminals=set(self.grammar.terminals),
+            nonterminals=set(self.grammar.nonterminals),
+            productions={A: list(productions) for A, productions in self.grammar.productions.items()},
+            start_symbol=self.grammar.start_symbol,
+            prev_start_symbol=self.grammar._prev_start_symbol,
+            precedence=self.grammar.precedence,
+            production_precedence=self.grammar.production_precedence)
+
+    def _LR1(self, phases, traced):
+        # The LR(1) and LALR reports both list the phases that built the LR(1) collection
+        if traced not in self._LR1_collections:
+            grammar = self._copy_grammar(LR1Grammar)
+            collection_phases = []
+            collection = self._collection(grammar, collection_phases, traced)
+            self._LR1_collections[traced] = grammar, collection, collection_phases
+        grammar, collection, collection_phases = self._LR1_collections[traced]
+        phases.extend(collection_phases)
+        return (grammar, ) + collection
+
+    def _collection(self, grammar, phases, traced):
+        # Returns the sets of items, transitions[i], a dict from a symbol X to the index of
+        # GOTO(states[i], X), the index of the start state and the ID the tables give each
+        # state. Like in the tables, the states are numbered in the order grammar.items() has
+        # them, so the states of a conflict can be looked up in the table's.
+        states = self._measure(phases, 'items', lambda: list(grammar.items()), traced)
+        index = {I: i for i, I in enumerate(states)}
+        start = next(i for i, I in enumerate(states) if self._is_start_state(grammar, I))
+
+        def find_transitions():
+            symbols = sorted(grammar.terminals | grammar.nonterminals, key=lambda X: X.string)
+            transitions = []
+            for I in states:
+                transitions.append({X: index[J] for X in symbols if len(J := grammar.goto(I, X)) > 0})
+            return transitions
+        transitions = self._measure(phases, 'transitions', find_transitions, traced)
+        return states, transitions, start, list(range(len(states)))
+
+    @staticmethod
+    def _is_start_state(grammar, I):
+        return any(item.A == grammar.start_symbol and item.dot_position == 0 for item in I.get_items())
+
+    @staticmethod
+    def _merge_cores(states, transitions, start):
+        # Groups the LR(1) states by core. A merged state holds the items of its group and its
+        # ID is the sorted tuple of the IDs of the group, like in SpaceConsumingLALRParsingTable.
+        core_index = dict()
+        group_of = []
+        for I in states:
+            core = frozenset(LR0Item._key(item) for item in I.get_items())
+            group_of.append(core_index.setdefault(core, len(core_index)))
+        merged = [[] for _ in core_index]
+        merged_transitions = [dict() for _ in core_index]
+        for i, I in enumerate(states):
+            merged[group_of[i]].extend(I.get_items())
+            for X, j in transitions[i].items():
+                merged_transitions[group_of[i]][X] = group_of[j]
+        IDs = [[] for _ in core_index]
+        for i in range(len(states)):
+            IDs[group_of[i]].append(i)
+        return ([_ItemList(items) for items in merged], merged_transitions, group_of[start],
+                [tuple(sorted(ID)) for ID in IDs])
+
+    @staticmethod
+    def _actions(grammar, states, transitions, lookaheads):
+        # Maps (state, token class) to the actions a table would be left with there once
+        # precedence has settled what it can, the entries nonassoc makes errors left out
+        candidates = ActionCandidates(grammar)
+        for i, I in enumerate(states):
+            for item in I.get_items():
+                candidates.add_item(i, item, lookaheads, transitions[i].get)
+        actions = {key: candidates.settle(key) for key in candidates.entries}
+        return {key: entry for key, entry in actions.items() if len(entry) > 0}
+
+    @staticmethod
+    def _conflict(grammar, states, transitions, start, IDs, conflict):
+        # The actions are (description, item) pairs, shifts listing every item that shifts. States
+        # are given by the IDs the tables use.
+        assert isinstance(conflict, LRConflict)
+        items = [LR0Item(item.A, item.production, item.dot_position) for item in states[conflict.state].get_items()]
+        actions = []
+        for action, data in conflict.actions:
+            if action == LRAction.SHIFT:
+                actions.extend((f'shift {IDs[data]}', item) for item in dict.fromkeys(items)
+                               if item.dot_position < len(item.production)
+                               and isinstance(X := item.production[item.dot_position], Terminal)
+                               and type(X.token) == conflict.token)
+            elif action == LRAction.REDUCE:
+                actions.append(('reduce', LR0Item(data.A, data.production, data.dot_position)))
+            else:
+                actions.extend(('accept', item) for item in dict.fromkeys(items)
+                               if item.A == grammar.start_symbol and item.dot_position == len(item.production))
+        return {
+            'type': conflict.kind(),
+            'state': IDs[conflict.state],
+            'lookahead': conflict.token.__name__,
+            'prefix': GrammarReport._viable_prefix(start, conflict.state, transitions),
+            'actions': actions,
+        }
+
+    @staticmethod
+    def _viable_prefix(start, target, transitions):
+        # The shortest sequence of symbols that takes the start state to target
+        previous = {start: None}
+        queue = deque([start])
+        while len(queue) > 0:
+            i = queue.popleft()
+            if i == target:
+                break
+            for X, j in transitions[i].items():
+                if j not in previous:
+                    previous[j] = (i, X)
+                    queue.append(j)
+        prefix = []
+        while previous[target] is not None:
+            target, X = previous[target]
+            prefix.append(X)
+        return list(reversed(prefix))
+
+    @staticmethod
+    def _measure(phases, name, f, traced):
+        # Runs f, appending (name, seconds, peak bytes allocated while it ran) to phases. The
+        # peak is None unless traced.
+        if not traced:
+            start = time.perf_counter()
+            result = f()
+            phases.append((name, time.perf_counter() - start, None))
+            return result
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        start = time.perf_counter()
+        result = f()
+        seconds = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        if started_tracing:
+            tracemalloc.stop()
+        phases.append((name, seconds, peak - base))
+        return result
+
+
+class _ItemList:
+    # The items of a merged LALR state, with the same get_items as an LRItemGroup
+    def __init__(self, items):
+        self.items = items
+
+    def get_items(self):
+        return tuple(self.items)
+
+
+_kinds = ['SLR1', 'LALR', 'LR1']
+
+
+def main():
+    # Run from MyCompiler so the textbook grammars can be found, e.g.
+    #   python SyntaxAnalysis/Parser/GrammarReport.py --grammar 4.3 --parser SLR1 LALR
+    argument_parser = argparse.ArgumentParser(
+        description='Report the states, table sizes and conflicts of the LR parsers of a grammar.')
+    argument_parser.add_argument('--grammar', default='ANSI C')
+    argument_parser.add_argument('--parser', nargs='+', choices=_kinds, default=_kinds)
+    argument_parser.add_argument('--memory', action='store_true',
+                                 help='also find the peak memory of every phase, which takes a second build')
+    args = argument_parser.parse_args()
+    report = GrammarReport(GrammarFileLoader.load(args.grammar), measure_memory=args.memory)
+    print(report.format(report.analyze(kind) for kind in args.parser))
+
+
+if __name__ == '__main__':
+    main()
@@ -5,6 +5,10 @@ class ParseTree:
     def __init__(self, symbol):
         self.symbol = symbol
         self.children = []
+        # Only filled in by parsers that reuse subtrees between parses: how many tokens this
+        # subtree spans and the LR state the parser was in right before its first token.
+        self.token_count = None
+        self.state = None
 
     # https://stackoverflow.com/questions/20242479/printing-a-tree-data-structure-in-python
     def __str__(self, level=0):
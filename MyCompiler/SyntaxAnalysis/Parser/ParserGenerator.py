@@ -0,0 +1,192 @@
+import argparse
+
+from Enums import LRAction
+from LRParsers import add_parser_arguments, load_parser
+from SLR1Parser import SLR1Parser
+
+
+class ParserGenerator:
+    # Writes an LR parser out as a standalone Python module, the way yacc does for C. The module
+    # only holds ints and strings and a driver loop over them, so using it never builds the
+    # grammar's items or imports anything from here.
+    # Terminals are named after their token class, which is also what a module from
+    # LexerGenerator yields, so the two can be chained: parse(generated_lexer.tokens(text)).
+    # States, terminals, nonterminals and productions are all numbered from 0, with state 0 the
+    # start state. An action is encoded as an int:
+    #   a > 0: shift and go to state a - 1
+    #   a < 0: reduce by production -a - 1
+    #   a = 0: accept
+    # The ACTION and GOTO tables are mostly empty so their rows are packed into one array each
+    # with row displacement, see _pack.
+    def __init__(self, parser):
+        assert isinstance(parser, SLR1Parser)
+        self.parser = parser
+
+    def tables(self):
+        # Returns (tables, productions): everything the generated module holds as a dict of
+        # plain values and the (A, production) pairs in the order they are numbered.
+        parsing_table = self.parser._parsing_table
+        grammar = self.parser._grammar
+
+        state_index = {parsing_table._get_state_ID(parsing_table.start_state): 0}
+        for (state, _), (action, data) in parsing_table._action_table.items():
+            state_index.setdefault(state, len(state_index))
+            if action == LRAction.SHIFT:
+                state_index.setdefault(data, len(state_index))
+        for (state, _), target in parsing_table._goto_table.items():
+            state_index.setdefault(state, len(state_index))
+            state_index.setdefault(target, len(state_index))
+        for state in parsing_table._default_reductions:
+            state_index.setdefault(state, len(state_index))
+
+        nonterminals = sorted(grammar.nonterminals)
+        nonterminal_index = {A: i for i, A in enumerate(nonterminals)}
+        productions = [(A, production) for A, production_list in grammar.productions.items()
+                       for production in production_list]
+        production_index = {production: p for p, production in enumerate(productions)}
+        terminals = sorted({token.__name__ for _, token in parsing_table._action_table})
+        terminal_index = {name: i for i, name in enumerate(terminals)}
+
+        action_rows = [dict() for _ in state_index]
+        for (state, token), (action, data) in parsing_table._action_table.items():
+            if action == LRAction.SHIFT:
+                value = state_index[data] + 1
+            elif action == LRAction.REDUCE:
+                value = -production_index[(data.A, data.production)] - 1
+            else:
+                value = 0
+            action_rows[state_index[state]][terminal_index[token.__name__]] = value
+        default_actions = [None] * len(state_index)
+        for state, (_, item) in parsing_table._default_reductions.items():
+            default_actions[state_index[state]] = -production_index[(item.A, item.production)] - 1
+        goto_rows = [dict() for _ in state_index]
+        for (state, A), target in parsing_table._goto_table.items():
+            goto_rows[state_index[state]][nonterminal_index[A]] = state_index[target]
+
+        action_base, action_check, action_value = self._pack(action_rows)
+        goto_base, goto_check, goto_value = self._pack(goto_rows)
+        return {
+            'TERMINALS': tuple(terminals),
+            'NONTERMINALS': tuple(A.string for A in nonterminals),
+            'PRODUCTION_LHS': tuple(nonterminal_index[A] for A, _ in productions),
+            'PRODUCTION_LENGTHS': tuple(len(production) for _, production in productions),
+            'ACTION_BASE': tuple(action_base),
+            'ACTION_CHECK': tuple(action_check),
+            'ACTION_VALUE': tuple(action_value),
+            'DEFAULT_ACTIONS': tuple(default_actions),
+            'GOTO_BASE': tuple(goto_base),
+            'GOTO_CHECK': tuple(goto_check),
+            'GOTO_VALUE': tuple(goto_value),
+        }, productions
+
+    def generate(self):
+        # Returns the source of the module
+        tables, productions = self.tables()
+        lines = [
+            '# Generated by ParserGenerator, do not edit.',
+            '#',
+            '# Productions:',
+        ]
+        lines.extend(f'#   {p}: {A.string} -> {" ".join(X.string for X in production)}'
+                     for p, (A, production) in enumerate(productions))
+        lines.extend([
+            '#',
+            '# The entry for state s and symbol X of a packed table is at BASE[s] + X when',
+            '# CHECK[BASE[s] + X] == s, otherwise there is none. ACTION entries are shifts when',
+            '# positive, reductions when negative and 0 for accept. A state without an ACTION entry',
+            '# for a terminal takes its DEFAULT_ACTIONS entry, None being an error.',
+        ])
+        lines.extend(f'{name} = {value!r}' for name, value in tables.items())
+        lines.append(_DRIVER)
+        return '\n'.join(lines)
+
+    def write(self, path):
+        with open(path, mode='w', encoding='utf-8') as f:
+            f.write(self.generate())
+
+    @staticmethod
+    def _pack(rows):
+        # Overlays the rows of a sparse table, each a dict from column to value, into a single
+        # array by giving every row the first offset at which none of its entries land on an
+        # entry of an earlier row. Returns (base, check, value) where row i's entry in column j
+        # is value[base[i] + j] if check[base[i] + j] == i. Rows are placed densest first since
+        # those are the hardest to fit.
+        base = [0] * len(rows)
+        check = []
+        value = []
+        for i in sorted(range(len(rows)), key=lambda i: -len(rows[i])):
+            columns = rows[i]
+            offset = 0
+            while any(offset + j < len(check) and check[offset + j] is not None for j in columns):
+                offset += 1
+            base[i] = offset
+            for j, entry in columns.items():
+                if offset + j >= len(check):
+                    check.extend([None] * (offset + j + 1 - len(check)))
+                    value.extend([None] * (offset + j + 1 - len(value)))
+                check[offset + j] = i
+                value[offset + j] = entry
+        return base, [-1 if i is None else i for i in check], [0 if entry is None else entry for entry in value]
+
+
+# The part of the generated module that doesn't depend on the grammar
+_DRIVER = '''
+TERMINAL_IDS = {name: i for i, name in enumerate(TERMINALS)}
+
+
+def action(s, name):
+    # The encoded action of state s on the terminal with the given name or None on an error
+    t = TERMINAL_IDS.get(name)
+    if t is not None:
+        i = ACTION_BASE[s] + t
+        if i < len(ACTION_CHECK) and ACTION_CHECK[i] == s:
+            return ACTION_VALUE[i]
+    return DEFAULT_ACTIONS[s]
+
+
+def goto(s, A):
+    return GOTO_VALUE[GOTO_BASE[s] + A]
+
+
+def parse(tokens):
+    # tokens is an iterable of (token name, lexeme) pairs, e.g. tokens() of a module from
+    # LexerGenerator. Returns the parse tree as nested (nonterminal name, children) tuples
+    # with the (token name, lexeme) pairs as leaves.
+    tokens = iter(tokens)
+    end = ('EndToken', '$')
+    token = next(tokens, end)
+    stack = [0]
+    values = []
+    while True:
+        a = action(stack[-1], token[0])
+        if a is None:
+            raise Exception(f'Syntax error at {token}')
+        if a > 0:
+            stack.append(a - 1)
+            values.append(token)
+            token = next(tokens, end)
+        elif a < 0:
+            p = -a - 1
+            n = len(values) - PRODUCTION_LENGTHS[p]
+            node = (NONTERMINALS[PRODUCTION_LHS[p]], tuple(values[n:]))
+            del values[n:]
+            del stack[n + 1:]
+            values.append(node)
+            stack.append(goto(stack[-1], PRODUCTION_LHS[p]))
+        else:
+            return values[-1]
+'''
+
+
+def main():
+    # Run from this directory so the textbook grammars can be found, e.g.
+    #   python ParserGenerator.py --grammar 4.40 --parser LALR parser_4_40.py
+    argument_parser = argparse.ArgumentParser(description='Write an LR parser out as a Python module.')
+    argument_parser.add_argument('output')
+    add_parser_arguments(argument_parser)
+    args = argument_parser.parse_args()
+    ParserGenerator(load_parser(args)).write(args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -12,8 +12,10 @@ class CanonicalLR1Parser(SLR1Parser):
                 nonterminals=self._grammar.nonterminals,
                 productions=self._grammar.productions,
                 start_symbol=self._grammar.start_symbol,
-                prev_start_symbol=self._grammar._prev_start_symbol)
-        self._parsing_table = CanonicalLRParsingTable(self._grammar)
+                prev_start_symbol=self._grammar._prev_start_symbol,
+                precedence=self._grammar.precedence,
+                production_precedence=self._grammar.production_precedence)
+        self._parsing_table = CanonicalLRParsingTable(self._grammar, self._resolve_conflicts, self._default_reductions)
 
 
 
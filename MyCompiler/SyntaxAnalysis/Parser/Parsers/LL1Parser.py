@@ -1,3 +1,11 @@
+from itertools import combinations
+
+from BaseGrammar import BaseGrammar
+from BaseParser import BaseParser
+from Nonterminal import Nonterminal
+from ParseTree import ParseTree
+from Terminal import Terminal, epsilon_terminal
+from Tokens import EmptyToken, EndToken
 
 
 class LL1Parser(BaseParser):
@@ -5,11 +13,18 @@ class LL1Parser(BaseParser):
         super().__init__(grammar)
         self._table = dict()
         self._bypass_checks = bypass_checks
+        # The int-coded copy of self._table that produce_derivation runs on, see _compile_table
+        self._terminal_IDs = None
+        self._start_code = None
+        self._productions = None
+        self._production_codes = None
+        self._predict = None
         self._prepare_internals()
         self._verify()
 
     def _prepare_internals(self):
         self._build_parsing_table()
+        self._compile_table()
 
     def _verify(self):
         assert isinstance(self._grammar, BaseGrammar)
@@ -65,7 +80,7 @@ class LL1Parser(BaseParser):
                             self._table[A].setdefault(type(b.token), set()).add(tuple(alpha))
 
         for A, rules in self._table.items():
-            if epsilon_terminal in rules.keys():
+            if EmptyToken in rules.keys():
                 del self._table[A][EmptyToken]
 
         if self._bypass_checks:
@@ -74,36 +89,84 @@ class LL1Parser(BaseParser):
             for a, rule in rules.items():
                 assert len(rule) == 1, "This should only fail if the grammar is ambiguous which it shouldn't be."
 
+    def _compile_table(self):
+        # Numbers everything in the parsing table so that parsing only ever looks at ints:
+        #   - Terminals are numbered by their type of token from 0 up, with $ last.
+        #   - Nonterminal number i is coded as -i - 1 on the stack so that a symbol is a terminal
+        #     exactly when its code isn't negative.
+        #   - _productions[p] is the (A, production) pair of production p and
+        #     _production_codes[p] the codes of its symbols in the order they are pushed, that is
+        #     reversed and without ε.
+        #   - _predict[i][t] is the production to expand nonterminal i with on terminal t, None
+        #     when there is none and -1 when there are several.
+        nonterminal_IDs = {A: i for i, A in enumerate(sorted(self._grammar.nonterminals))}
+        self._start_code = -nonterminal_IDs[self._grammar.start_symbol] - 1
+        token_types = {token_type for rules in self._table.values() for token_type in rules}
+        for A, productions in self._grammar.productions.items():
+            for production in productions:
+                for X in production:
+                    if isinstance(X, Terminal) and X != epsilon_terminal:
+                        token_types.add(type(X.token))
+        token_types.discard(EndToken)
+        self._terminal_IDs = {token_type: i for i, token_type in
+                              enumerate(sorted(token_types, key=lambda token_type: token_type.__name__))}
+        self._terminal_IDs[EndToken] = len(self._terminal_IDs)
+
+        def code(X):
+            if isinstance(X, Nonterminal):
+                return -nonterminal_IDs[X] - 1
+            return self._terminal_IDs[type(X.token)]
+
+        self._productions = []
+        self._production_codes = []
+        production_IDs = dict()
+        for A, productions in self._grammar.productions.items():
+            for production in productions:
+                production_IDs[(A, tuple(production))] = len(self._productions)
+                self._productions.append((A, tuple(production)))
+                self._production_codes.append(
+                    tuple(code(X) for X in reversed(production) if X != epsilon_terminal))
+
+        self._predict = [[None] * len(self._terminal_IDs) for _ in nonterminal_IDs]
+        for A, rules in self._table.items():
+            for token_type, rule in rules.items():
+                p = production_IDs[(A, next(iter(rule)))] if len(rule) == 1 else -1
+                self._predict[nonterminal_IDs[A]][self._terminal_IDs[token_type]] = p
+
     def produce_derivation(self, w):
-        def to_input_string(tokens):
-            for token in tokens:
-                yield token
-            yield EndToken()
-
-        # The input string is a
-        input_string = to_input_string(w)
-        stack = [end_terminal, self._grammar.start_symbol]
-        a = next(input_string)
+        # The predictive parser of algorithm 4.34 on the int-coded table.
+        terminal_IDs = self._terminal_IDs
+        predict = self._predict
+        productions = self._productions
+        production_codes = self._production_codes
+        end = terminal_IDs[EndToken]
+        tokens = iter(w)
+
+        def next_token():
+            a = next(tokens, None)
+            if a is None:
+                return EndToken(), end
+            return a, terminal_IDs.get(type(a), -1)
+
+        stack = [end, self._start_code]
+        a, t = next_token()
         X = stack[-1]
-        while X != end_terminal:
-            if isinstance(X, Terminal) and isinstance(X.token, type(a)):
+        while X != end:
+            if X >= 0:
+                if X != t:
+                    raise Exception('Error')
                 stack.pop()
                 yield a, None
-                a = next(input_string)
-            elif isinstance(X, Terminal):
-                raise Exception('Error')
-            elif type(a) not in self._table[X]:
-                raise Exception('Error')
+                a, t = next_token()
             else:
-                # output the production
-                productions = self._table[X][type(a)]
-                if len(productions) > 1:
+                p = predict[-X - 1][t] if t >= 0 else None
+                if p is None:
+                    raise Exception('Error')
+                if p == -1:
                     raise Exception('Special care needed here, this grammar is ambiguous')
-                production = next(iter(productions))
-                # print((X, production))
-                yield (X, production)
+                yield productions[p]
                 stack.pop()
-                stack.extend(reversed([_ for _ in production if _ != epsilon_terminal]))
+                stack.extend(production_codes[p])
             X = stack[-1]
         yield a
 
@@ -116,7 +179,8 @@ class LL1Parser(BaseParser):
                 if isinstance(child.token, EmptyToken):
                     child_to_add = ParseTree(EmptyToken())
                 else:
-                    child_to_add = ParseTree(next(derivation_iterator))
+                    token, _ = next(derivation_iterator)
+                    child_to_add = ParseTree(token)
             else:
                 child_to_add = self.to_parse_tree(derivation_iterator)
             curr_node.children.append(child_to_add)
@@ -0,0 +1,22 @@
+from CanonicalLR1Parser import CanonicalLR1Parser
+from GrammarFileLoader import GrammarFileLoader
+from SLR1Parser import SLR1Parser
+from SpaceConsumingLALRParser import SpaceConsumingLALRParser
+
+# The LR parsers the command line tools can build, by the name they're picked with
+LR_parsers = {
+    'SLR1': SLR1Parser,
+    'LR1': CanonicalLR1Parser,
+    'LALR': SpaceConsumingLALRParser,
+}
+
+
+def add_parser_arguments(argument_parser):
+    # The options every command line tool that builds an LR parser takes
+    argument_parser.add_argument('--grammar', default='ANSI C')
+    argument_parser.add_argument('--parser', choices=sorted(LR_parsers), default='LALR')
+
+
+def load_parser(args):
+    # Builds the parser picked by the options add_parser_arguments added
+    return LR_parsers[args.parser](GrammarFileLoader.load(args.grammar))
@@ -0,0 +1,37 @@
+from Enums import LRAction
+from SLR1Parser import SLR1Parser
+from Terminal import Terminal, end_terminal
+
+
+class LRPushParser:
+    # Push based front end for any of the LR parsers. Instead of pulling tokens out of an
+    # iterator until the input runs out, tokens are handed over as they become available and
+    # each call returns the steps of the derivation (in the same format as produce_derivation)
+    # that could be completed so far. Nothing here ever blocks, so it can be driven straight
+    # from an asyncio protocol or stream reader.
+    def __init__(self, parser):
+        assert isinstance(parser, SLR1Parser)
+        self._parser = parser
+        self._stack = [parser._parsing_table.start_state]
+        self.accepted = False
+
+    def feed(self, tokens):
+        assert not self.accepted, 'The input has already been accepted.'
+        derivation = []
+        for token in tokens:
+            self._consume(Terminal(token=token), derivation)
+        return derivation
+
+    def close(self):
+        # Marks the end of the input and returns the rest of the derivation.
+        derivation = []
+        if not self.accepted:
+            self._consume(end_terminal, derivation)
+            self.accepted = True
+        return derivation
+
+    def _consume(self, a, derivation):
+        action = self._parser.consume(self._stack, a, derivation)
+        if action == LRAction.ERROR:
+            raise Exception(f'Syntax error at {a}')
+        assert action == LRAction.SHIFT or a == end_terminal
@@ -9,10 +9,22 @@ from Terminal import Terminal, end_terminal
 
 
 class SLR1Parser(BaseParser):
-    def __init__(self, grammar):
+    def __init__(self, grammar, resolve_conflicts=False, bypass_unit_reductions=False, default_reductions=False):
+        # With resolve_conflicts a grammar that isn't SLR(1) still gets a parser, its conflicts
+        # being resolved as described in SLRParsingTable and listed in its conflicts.
+        # With bypass_unit_reductions the parser never reduces by a unit production A -> B, B a
+        # nonterminal, see SLRParsingTable.unit_chain_goto, so expression grammars like 4.40
+        # take a fraction of the steps. Those reductions aren't in the derivation either, which
+        # makes to_parse_tree leave their nodes out: B's node stands where A's would be.
+        # With default_reductions the parsing table uses default reductions, see
+        # SLRParsingTable, and consume makes the reductions of consistent states right after
+        # a shift instead of waiting for the next token.
         assert isinstance(grammar, BaseGrammar)
         super().__init__(grammar)
         self._parsing_table = None
+        self._resolve_conflicts = resolve_conflicts
+        self._bypass_unit_reductions = bypass_unit_reductions
+        self._default_reductions = default_reductions
         self._prepare_internals()
         self._verify()
 
@@ -20,7 +32,7 @@ class SLR1Parser(BaseParser):
         pass
 
     def _prepare_internals(self):
-        self._parsing_table = SLRParsingTable(self._grammar)
+        self._parsing_table = SLRParsingTable(self._grammar, self._resolve_conflicts, self._default_reductions)
 
     def produce_derivation(self, w):
         assert isinstance(self._parsing_table, SLRParsingTable)
@@ -30,9 +42,20 @@ class SLR1Parser(BaseParser):
             yield end_terminal
 
         # The input string is a
-        input_string = to_input_string(w)
         stack = [self._parsing_table.start_state]
-        a = next(input_string)
+        for a in to_input_string(w):
+            derivation = []
+            action = self.consume(stack, a, derivation)
+            yield from derivation
+            if action != LRAction.SHIFT:
+                # Either we accepted or hit an error
+                break
+
+    def consume(self, stack, a, derivation):
+        # Makes all the moves the parser can make with a as the lookahead: zero or more
+        # reductions followed by shifting a, accepting or running into an error. The stack is
+        # updated in place and every step of the derivation is appended to derivation.
+        # Returns the action the parser stopped on.
         while True:
             s = stack[-1]
             action, data = self._parsing_table.action(s, a)
@@ -40,8 +63,10 @@ class SLR1Parser(BaseParser):
                 t = data
                 assert isinstance(t, LRState)
                 stack.append(t)
-                yield a.token, None
-                a = next(input_string)
+                derivation.append((a.token, None))
+                if self._default_reductions:
+                    self._reduce_without_lookahead(stack, derivation)
+                return action
 
             elif action == LRAction.REDUCE:
                 item = data
@@ -49,18 +74,34 @@ class SLR1Parser(BaseParser):
                 for _ in item.production:
                     stack.pop(-1)
                 t = stack[-1]
-                stack.append(self._parsing_table.goto(t, item.A))
-                yield item.A, item.production
+                if self._bypass_unit_reductions:
+                    stack.append(self._parsing_table.unit_chain_goto(t, item.A, a))
+                    # Only after a reduction _reduce_without_lookahead stopped at
+                    if self._parsing_table._is_unit_production(item.production):
+                        continue
+                else:
+                    stack.append(self._parsing_table.goto(t, item.A))
+                derivation.append((item.A, item.production))
 
             elif action == LRAction.ACCEPT:
                 # Success!
-                break
+                return action
             elif action == LRAction.ERROR:
                 # Handle error
-                break
+                return action
             else:
                 raise Exception('Unknown action.')
 
+    def _reduce_without_lookahead(self, stack, derivation):
+        # Makes the reductions that don't depend on the next token. Unit reductions made here
+        # are bypassed too, they're just not in the derivation.
+        while (item := self._parsing_table.reduction_without_lookahead(stack[-1])) is not None:
+            for _ in item.production:
+                stack.pop(-1)
+            stack.append(self._parsing_table.goto(stack[-1], item.A))
+            if not (self._bypass_unit_reductions and self._parsing_table._is_unit_production(item.production)):
+                derivation.append((item.A, item.production))
+
     def to_parse_tree(self, derivation_iterator):
         children = []
         for data in derivation_iterator:
@@ -0,0 +1,78 @@
+from Tokens import EndToken
+from BaseGrammar import BaseGrammar
+from Enums import LRAction
+from LR0Item import LR0Item
+from Terminal import Terminal
+
+
+class ActionCandidates:
+    # Every action wanted for each entry of an ACTION table, keyed (state ID, token class) the
+    # way the tables key them. The parsing tables fill one in while they are built and so does
+    # GrammarReport, so the report counts exactly the entries and conflicts a table ends up with.
+    def __init__(self, grammar):
+        assert isinstance(grammar, BaseGrammar)
+        self._grammar = grammar
+        # Key to the distinct (LRAction, data) values wanted there, in the order they came up
+        self.entries = dict()
+        # The lookahead of an entry is a token class, precedence is declared for terminals
+        self._precedence_terminals = {type(terminal.token): terminal for terminal in grammar.precedence
+                                      if terminal in grammar.terminals}
+
+    def add_item(self, state_ID, item, lookaheads, goto):
+        # Adds the actions item wants in the state with the given ID. lookaheads(item) are the
+        # terminals a complete item is reduced on and goto(a) is the ID of the state shifting a
+        # leads to, or None.
+        assert isinstance(item, LR0Item)
+        if item.dot_position == len(item.production):
+            if item.A == self._grammar.start_symbol:
+                # (c)
+                # If [S' -> S .] is in I_i, then set ACTION[i, $] to "accept."
+                self.add((state_ID, EndToken), (LRAction.ACCEPT, None))
+            else:
+                # (b)
+                # If [A -> α .] is in I_i, then set ACTION[i, a] to "reduce A -> α" for all
+                # lookaheads a of the item; here A may not be S'.
+                for a in lookaheads(item):
+                    self.add((state_ID, type(a.token)), (LRAction.REDUCE, item))
+        else:
+            a = item.production[item.dot_position]
+            if isinstance(a, Terminal):
+                # (a)
+                # If [A -> α . a β] is in I_i and GOTO(I_i, a) = I_j, then set ACTION[i, a] to
+                # "shift j ." Here a must be a terminal.
+                j = goto(a)
+                if j is not None:
+                    self.add((state_ID, type(a.token)), (LRAction.SHIFT, j))
+
+    def add(self, key, value):
+        entry = self.entries.setdefault(key, [])
+        if not any(self._same(value, other) for other in entry):
+            entry.append(value)
+
+    def settle(self, key):
+        # The actions left for an entry once precedence has had its say: a shift/reduce conflict
+        # between a production and a terminal that both have a precedence is settled by it, see
+        # BaseGrammar.resolve_by_precedence. An empty list means nonassoc made the entry an error.
+        candidates = self.entries[key]
+        actions = list(candidates)
+        a = self._precedence_terminals.get(key[1])
+        if a is None or all(action != LRAction.SHIFT for action, _ in candidates):
+            return actions
+        for value in candidates:
+            action, item = value
+            if action != LRAction.REDUCE:
+                continue
+            choice = self._grammar.resolve_by_precedence(item.A, item.production, a)
+            if choice == LRAction.REDUCE or choice == LRAction.ERROR:
+                actions = [other for other in actions if other[0] != LRAction.SHIFT]
+            if choice == LRAction.SHIFT or choice == LRAction.ERROR:
+                actions.remove(value)
+        return actions
+
+    @staticmethod
+    def _same(value, other):
+        # Reducing by a production is one action whatever the lookaheads of the items asking
+        # for it, several terminals can share a token class
+        if value[0] == LRAction.REDUCE and other[0] == LRAction.REDUCE:
+            return LR0Item._key(value[1]) == LR0Item._key(other[1])
+        return value == other
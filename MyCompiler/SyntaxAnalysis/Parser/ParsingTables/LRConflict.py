@@ -0,0 +1,26 @@
+from Enums import LRAction
+
+
+class LRConflict:
+    # Two or more actions for the same entry of an ACTION table. state is the ID of the state
+    # as the table keys it, token the token class of the lookahead and actions the distinct
+    # (LRAction, data) values that were set there, in the order they came up. resolution is
+    # the one the table kept, or None when conflicts aren't resolved.
+    def __init__(self, state, token, actions):
+        self.state = state
+        self.token = token
+        self.actions = actions
+        self.resolution = None
+
+    def kind(self):
+        # Accepting and shifting never conflict, $ is never shifted
+        actions = {action for action, _ in self.actions}
+        if LRAction.SHIFT in actions:
+            return 'shift/reduce'
+        if LRAction.ACCEPT in actions:
+            return 'accept/reduce'
+        return 'reduce/reduce'
+
+    def __repr__(self):
+        actions = ', '.join(f'{action.name} {data}' for action, data in self.actions)
+        return f'LRConflict({self.kind()} in state {self.state} on {self.token.__name__}: {actions})'
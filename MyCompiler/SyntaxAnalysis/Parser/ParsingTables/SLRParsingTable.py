@@ -1,19 +1,44 @@
-from Tokens import EndToken
+from ActionCandidates import ActionCandidates
 from BaseGrammar import BaseGrammar
 from Enums import LRAction
 from LR0Item import LR0Item
+from LRConflict import LRConflict
 from LRState import LRState
 from Nonterminal import Nonterminal
 from Terminal import Terminal
 
 
 class SLRParsingTable:
-    def __init__(self, grammar):
+    # What the grammar isn't when there are conflicts
+    grammar_kind = 'SLR(1)'
+
+    def __init__(self, grammar, resolve_conflicts=False, default_reductions=False):
+        # Every action wanted for an entry of ACTION is kept while the table is built. Once it
+        # is done, shift/reduce conflicts between a production and a terminal that both have a
+        # precedence are settled by it, see ActionCandidates.settle, and whatever conflicts are
+        # left are recorded in self.conflicts. If there are any the build fails,
+        # listing all of them, unless resolve_conflicts is set, in which case each one is
+        # resolved the way yacc does by default, see _resolve.
+        # With default_reductions, a state whose reductions are all by the same production
+        # reduces by it on any lookahead it doesn't shift on, see _set_default_reductions.
         assert isinstance(grammar, BaseGrammar)
         self._grammar = grammar
         self._states = None
         self._action_table = dict()
         self._goto_table = dict()
+        self._resolve_conflicts = resolve_conflicts
+        self.conflicts = []
+        # Every action wanted for each entry of ACTION, settled into it once all are known
+        self._candidates = ActionCandidates(grammar)
+        self._production_order = None
+        self._unit_chain_cache = dict()
+        self._use_default_reductions = default_reductions
+        # Entries nonassoc made errors, which a default reduction mustn't cover up
+        self._error_entries = set()
+        # State ID to its default (LRAction.REDUCE, item) and the IDs of the states that do
+        # nothing else
+        self._default_reductions = dict()
+        self._consistent_states = set()
         self.start_state = None
         self.setup()
 
@@ -46,45 +71,89 @@ class SLRParsingTable:
 
     def setup_action(self):
         for state in self._states:
-            # Let's determine the output transitions:
             for item in state:
-                assert isinstance(item, LR0Item)
-                if item.dot_position == len(item.production):
-                    # Only if we are in the set that contains the starting symbol with the production
-                    # where the dot is all the way on the right.
-                    if item.A == self._grammar.start_symbol:
-                        # (c)
-                        # If [S' -> S] is in I_i, then set ACTION[i, $] to "accept."
-                        key = (self._get_state_ID(state), EndToken)
-                        value = (LRAction.ACCEPT, None)
-                        assert key not in self._action_table or self._action_table[key] == value, \
-                            'Grammar is not SLR(1), conflicting actions exist.'
-                        self._action_table[key] = value
-                    else:
-                        # (b)
-                        # If [A -> α .] is in I_i, then set ACTION[i, a] to "reduce A -> α" for all
-                        # a in FOLLOW(A); here A may not be S'.
-                        for a in self._grammar.follow(item.A):
-                            key = (self._get_state_ID(state), type(a.token))
-                            value = (LRAction.REDUCE, item)
-                            assert key not in self._action_table or self._action_table[key] == value, \
-                                'Grammar is not SLR(1), conflicting actions exist.'
-                            self._action_table[key] = value
-                else:
-                    a = item.production[item.dot_position]
-
-                    if isinstance(a, Terminal):
-                        # (a)
-                        # If [A -> α . a β] is in I_i and GOTO(I_i, a) = I_j, then set ACTION[i, a] to
-                        # "shift j ." Here a must be a terminal.
-                        if I_j := self._grammar.goto(state.I(), a):
-                            if j := self.find_state(self._states, I_j):
-                                key = (self._get_state_ID(state), type(a.token))
-                                value = (LRAction.SHIFT, self._get_state_ID(j))
-                                assert key not in self._action_table or self._action_table[key] == value, \
-                                    'Grammar is not SLR(1), conflicting actions exist.'
-
-                                self._action_table[key] = value
+                self._candidates.add_item(self._get_state_ID(state), item, self._lookaheads,
+                                          lambda a: self._shift_target(state, a))
+
+    def _lookaheads(self, item):
+        # The terminals a complete item is reduced on
+        return self._grammar.follow(item.A)
+
+    def _shift_target(self, state, a):
+        if I_j := self._grammar.goto(state.I(), a):
+            if j := self.find_state(self._states, I_j):
+                return self._get_state_ID(j)
+        return None
+
+    def _settle_actions(self):
+        # Fills ACTION in from the candidates, recording the conflicts precedence leaves
+        for key in self._candidates.entries:
+            actions = self._candidates.settle(key)
+            if len(actions) == 0:
+                # nonassoc, a is an error here
+                self._error_entries.add(key)
+            elif len(actions) == 1:
+                self._action_table[key] = actions[0]
+            else:
+                conflict = LRConflict(key[0], key[1], actions)
+                self.conflicts.append(conflict)
+                if self._resolve_conflicts:
+                    conflict.resolution = self._resolve(conflict)
+                    self._action_table[key] = conflict.resolution
+        # Only needed while the table is built
+        self._candidates = None
+
+    def _set_default_reductions(self):
+        # Like yacc, a state whose reductions are all by the same production drops them from
+        # ACTION in favor of a default reduction by it, taken on every lookahead the state has
+        # no other entry for. That only delays finding a syntax error by a few reductions,
+        # it's still found before the bad token is shifted. A state that's left with no entries
+        # at all is consistent: it reduces whatever comes next, so the parser doesn't need the
+        # next token to do it, see reduction_without_lookahead.
+        reductions = dict()
+        other_entries = set()
+        for (state, token), (action, data) in self._action_table.items():
+            if action == LRAction.REDUCE:
+                reductions.setdefault(state, dict()).setdefault((data.A, data.production), (action, data))
+            else:
+                other_entries.add(state)
+        error_states = {state for state, _ in self._error_entries}
+        for state, state_reductions in reductions.items():
+            if len(state_reductions) != 1 or state in error_states:
+                continue
+            self._default_reductions[state] = next(iter(state_reductions.values()))
+            if state not in other_entries:
+                self._consistent_states.add(state)
+        for key in [key for key, (action, _) in self._action_table.items()
+                    if action == LRAction.REDUCE and key[0] in self._default_reductions]:
+            del self._action_table[key]
+
+    def reduction_without_lookahead(self, s):
+        # The item s reduces by no matter what the next token is, or None
+        assert isinstance(s, LRState)
+        ID = self._get_state_ID(s)
+        if ID in self._consistent_states:
+            return self._default_reductions[ID][1]
+        return None
+
+    def _resolve(self, conflict):
+        # yacc's defaults: shift rather than reduce and otherwise reduce by the production that
+        # comes first in the grammar.
+        assert isinstance(conflict, LRConflict)
+        for action, data in conflict.actions:
+            if action != LRAction.REDUCE:
+                return action, data
+        if self._production_order is None:
+            self._production_order = {(A, production): i for i, (A, production) in enumerate(
+                (A, production) for A, productions in self._grammar.productions.items()
+                for production in productions)}
+        return min(conflict.actions, key=lambda value: self._production_order[(value[1].A, value[1].production)])
+
+    def _check_conflicts(self):
+        self._settle_actions()
+        if len(self.conflicts) > 0 and not self._resolve_conflicts:
+            raise Exception(f'Grammar is not {self.grammar_kind}, {len(self.conflicts)} conflicting actions exist:\n' +
+                            '\n'.join(repr(conflict) for conflict in self.conflicts))
 
     def _get_state_ID(self, state):
         return state.ID
@@ -103,13 +172,16 @@ class SLRParsingTable:
         self.preprocess()
         self.setup_goto()
         self.setup_action()
+        self._check_conflicts()
+        if self._use_default_reductions:
+            self._set_default_reductions()
 
     def action(self, s, a):
         assert isinstance(s, LRState)
         assert isinstance(a, Terminal)
         key = (self._get_state_ID(s), type(a.token))
         if key not in self._action_table:
-            return LRAction.ERROR, None
+            return self._default_reductions.get(key[0], (LRAction.ERROR, None))
         action, data = self._action_table[key]
         if action == LRAction.SHIFT:
             return action, self._get_state_from_ID(data)
@@ -122,6 +194,32 @@ class SLRParsingTable:
         goto = self._goto_table[(self._get_state_ID(t), A)]
         return self._get_state_from_ID(goto)
 
+    def unit_chain_goto(self, t, A, a):
+        # GOTO(t, A) when nothing but reductions by unit productions C -> B, B a nonterminal,
+        # would follow with a as the lookahead. Otherwise it's the state those reductions end
+        # up in: the first state after t that does something else on a. The chain only depends
+        # on t, A and a, so it's only followed once for each of them.
+        assert isinstance(t, LRState)
+        assert isinstance(A, Nonterminal)
+        assert isinstance(a, Terminal)
+        key = (self._get_state_ID(t), A, type(a.token))
+        if key in self._unit_chain_cache:
+            return self._get_state_from_ID(self._unit_chain_cache[key])
+        u = self.goto(t, A)
+        # A cycle of unit productions can only be in a table with resolved conflicts, don't go
+        # round it forever
+        for _ in self._grammar.nonterminals:
+            action, item = self.action(u, a)
+            if action != LRAction.REDUCE or not self._is_unit_production(item.production):
+                break
+            u = self.goto(t, item.A)
+        self._unit_chain_cache[key] = self._get_state_ID(u)
+        return u
+
+    @staticmethod
+    def _is_unit_production(production):
+        return len(production) == 1 and isinstance(production[0], Nonterminal)
+
     def get_states(self):
         if self._states is not None:
             return self._states
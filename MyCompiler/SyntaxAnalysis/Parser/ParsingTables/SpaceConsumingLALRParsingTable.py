@@ -7,10 +7,12 @@ from MultiLRState import MultiLRState
 
 
 class SpaceConsumingLALRParsingTable(CanonicalLRParsingTable):
-    def __init__(self, grammar):
+    grammar_kind = 'LALR(1)'
+
+    def __init__(self, grammar, resolve_conflicts=False, default_reductions=False):
         self._id_to_core_group_ids = dict()
         assert isinstance(grammar, LALRGrammar)
-        super().__init__(grammar)
+        super().__init__(grammar, resolve_conflicts, default_reductions)
 
     def get_core_states(self):
         # Construct C = {I0, I1, ..., In}, the collection of sets of LR(1) items.
@@ -1,4 +1,5 @@
 import LexicalAnalyzer
+from BaseParser import BaseParser
 from GrammarFileLoader import GrammarFileLoader
 
 
@@ -6,7 +7,7 @@ class SyntaxAnalyzer:
     # This is basically just the parser at this point.
     def __init__(self, parser):
         self.parser = parser
-        assert isinstance(self.parser, Parser.BaseParser)
+        assert isinstance(self.parser, BaseParser)
 
     def process(self, input_tokens):
         derivation = self.parser.produce_derivation(input_tokens)
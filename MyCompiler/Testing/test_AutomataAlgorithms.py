@@ -1,9 +1,17 @@
+import random
+
 from unittest import TestCase
 
+from CompiledNFA import CompiledNFA
 from DFASimulator import DFASimulator
-from Elements import BaseElement
+from Elements import BaseElement, EmptyExpression
+from FollowposDFABuilder import FollowposDFABuilder
+from LazyDFASimulator import LazyDFASimulator
+from LexerTable import LexerTable
+from LexicalAnalyzer import LexicalAnalyzer
 from NFASimulator import NFASimulator
 from RegExpr import RegExpr
+from SymbolTable import SymbolTableManager
 
 
 class TestSimulator(TestCase):
@@ -39,8 +47,10 @@ class TestSimulator(TestCase):
             r'[\D]': ['a', 'b', ' '],
             r'[\D\d]': ['a', 'b', ' ', '1'],
             r'[\S]': ['a', 'b', '1'],
-            r'[^a-c^]': ['1', ' ', '\n', 'Z'],
-            r'.': ['a'],
+            r'[^a-c^]': ['1', ' ', '\n', 'Z', 'é', '\x00', '\U0010FFFF'],
+            r'.': ['a', '→', '\U0001F389'],
+            r'"[^"\n]*"': ['""', '"héllo → 世界"'],
+            r'[\W\d]+': ['1 π', '€'],
             r'a{0,}': ['', 'a', 'aa'],
             r'a{1,}': ['a', 'aa'],
             r'a{0,1}': ['', 'a'],
@@ -49,6 +59,9 @@ class TestSimulator(TestCase):
             r'a{1,8}': ['a', 'aaaaaaa', 'aaaaaaaa'],
             r'a{5,8}': ['aaaaa', 'aaaaaaaa'],
             r'a{5,}': ['aaaaa', 'aaaaaaa', 'aaaaaaaa'],
+            r'a{0,200}': ['', 'a' * 200],
+            r'(ab|c){3,150}': ['abcab', 'c' * 150],
+            r'ba{0,0}': ['b'],
             r'(\+\d{1,2}\s)?\(?\d{3}\)?[\s.-]\d{3}[\s.-]\d{4}':
                 [
                     '123-456-7890',
@@ -75,6 +88,9 @@ class TestSimulator(TestCase):
             r'[^\S\s]': [''],
             r'[]': ['literally anything'],
             r'[^a-c^]': ['a', 'b', 'c', '^'],
+            r'.': ['\n', 'é\n'],
+            r'\w': ['é', '٣'],
+            r'"[^"\n]*"': ['"a"b"', '"é\n"'],
             r'a{1,}': [''],
             r'a{0,1}': ['aa', 'aaa'],
             r'a{0,2}': ['aaa', 'aaaa'],
@@ -82,6 +98,9 @@ class TestSimulator(TestCase):
             r'a{1,8}': ['', 'aaaaaaaaa', 'aaaaaaaaaa', 'aaaaaaaaaaa', ],
             r'a{5,8}': ['', 'a', 'aa', 'aaa', 'aaaa', 'aaaaaaaaa','aaaaaaaaaa',],
             r'a{5,}': ['', 'a', 'aa', 'aaa', 'aaaa'],
+            r'a{0,200}': ['a' * 201],
+            r'(ab|c){3,150}': ['abc', 'c' * 151],
+            r'ba{0,0}': ['ba'],
         }
 
         with self.subTest(simulator='NFA'):
@@ -123,3 +142,108 @@ class TestSimulator(TestCase):
                     for testcase in test:
                         with self.subTest(regex=regex, testcase=testcase):
                             assert not dfaSim.simulate(BaseElement.element_list_from_string(testcase))
+
+        with self.subTest(simulator='followpos DFA'):
+            with self.subTest(type='Positive'):
+                for regex, test in positive_tests.items():
+                    builder = FollowposDFABuilder()
+                    builder.add(RegExpr.from_string(regex), None)
+                    dfaSim = DFASimulator(builder.build())
+                    for testcase in test:
+                        with self.subTest(regex=regex, testcase=testcase):
+                            assert dfaSim.simulate(BaseElement.element_list_from_string(testcase))
+
+            with self.subTest(type='Negative'):
+                for regex, test in negative_tests.items():
+                    builder = FollowposDFABuilder()
+                    builder.add(RegExpr.from_string(regex), None)
+                    dfaSim = DFASimulator(builder.build())
+                    for testcase in test:
+                        with self.subTest(regex=regex, testcase=testcase):
+                            assert not dfaSim.simulate(BaseElement.element_list_from_string(testcase))
+
+        with self.subTest(simulator='e-free NFA'):
+            with self.subTest(type='Positive'):
+                for regex, test in positive_tests.items():
+                    nfa = RegExpr.from_string(regex).to_NFA().to_epsilon_free()
+                    assert not any(isinstance(element, EmptyExpression)
+                                   for state in CompiledNFA(nfa).states for element in state.outgoing)
+                    nfaSim = NFASimulator(nfa)
+                    for testcase in test:
+                        with self.subTest(regex=regex, testcase=testcase):
+                            assert nfaSim.simulate(BaseElement.element_list_from_string(testcase))
+
+            with self.subTest(type='Negative'):
+                for regex, test in negative_tests.items():
+                    nfaSim = NFASimulator(RegExpr.from_string(regex).to_NFA().to_epsilon_free())
+                    for testcase in test:
+                        with self.subTest(regex=regex, testcase=testcase):
+                            assert not nfaSim.simulate(BaseElement.element_list_from_string(testcase))
+
+        with self.subTest(simulator='lazy DFA'):
+            # A tiny cache makes the simulator fall back on the NFA all the time
+            for max_states in [2, 10000]:
+                for regex, test in positive_tests.items():
+                    simulator = LazyDFASimulator(RegExpr.from_string(regex).to_NFA(), max_states=max_states)
+                    for testcase in test:
+                        with self.subTest(regex=regex, testcase=testcase, max_states=max_states):
+                            assert simulator.simulate(BaseElement.element_list_from_string(testcase))
+
+                for regex, test in negative_tests.items():
+                    simulator = LazyDFASimulator(RegExpr.from_string(regex).to_NFA(), max_states=max_states)
+                    for testcase in test:
+                        with self.subTest(regex=regex, testcase=testcase, max_states=max_states):
+                            assert not simulator.simulate(BaseElement.element_list_from_string(testcase))
+
+    def test_lazy_DFA_fallback(self):
+        # The DFA of this has over 64 states, so they don't all fit in the cache
+        regex = r'(a|b)*a(a|b)(a|b)(a|b)(a|b)(a|b)'
+        random_generator = random.Random(0)
+        expression = BaseElement.element_list_from_string(''.join(random_generator.choice('ab') for _ in range(20000)))
+        expected = NFASimulator(RegExpr.from_string(regex).to_NFA()).simulate(expression)
+        # Filling the cache once is no reason to give up on it, filling it again right away is
+        for max_states, flushes, fallbacks in [(64, 1, 0), (16, 2, 1)]:
+            with self.subTest(max_states=max_states):
+                simulator = LazyDFASimulator(RegExpr.from_string(regex).to_NFA(), max_states=max_states)
+                assert simulator.simulate(expression) == expected
+                assert (simulator.flushes, simulator.fallbacks) == (flushes, fallbacks)
+
+    def test_NFA_longest_match(self):
+        lexer = LexicalAnalyzer.ANSI_C_lexer()
+        lexer = LexicalAnalyzer(SymbolTableManager(), lexer.regular_definition, lexer.translation_rules, build_NFA=True)
+        nfa_simulator = NFASimulator(lexer._NFA)
+        dfa_simulator = DFASimulator(lexer._DFA)
+        string = BaseElement.element_list_from_string('int x->y = 1.5e+3f; s = "a\\" b"; return a...b >>= 0x1FUL;')
+        position = 0
+        while position < len(string):
+            with self.subTest(position=position):
+                end, accepting_states = nfa_simulator.longest_match(string, position)
+                expected_end, accepting_state = dfa_simulator.longest_match(string, position)
+                assert end == expected_end
+                assert accepting_state.accepted_state in accepting_states
+                position = end
+
+    def test_char_class_is_one_transition(self):
+        for regex in [r'[a-zA-Z_]', r'[^\\"]', r'\w', r'.']:
+            with self.subTest(regex=regex):
+                nfa = RegExpr.from_string(regex).to_NFA()
+                assert len(CompiledNFA(nfa).states) == 2
+                assert len(nfa.start.outgoing_flat()) == 1
+
+    def test_unicode_DFA_size(self):
+        # Negated classes hold all of Unicode but the DFA only gets a transition per ASCII
+        # character and one on a range for everything past that.
+        tests = {
+            r'[^a]': '世',
+            r'.*': 'héllo → 世界',
+            r'"(\\.|[^\\"])*"': '"héllo \\" \U0001F389"',
+        }
+        for regex, testcase in tests.items():
+            builder = FollowposDFABuilder()
+            builder.add(RegExpr.from_string(regex), None)
+            for dfa in [RegExpr.from_string(regex).to_NFA().to_DFA(), builder.build()]:
+                with self.subTest(regex=regex):
+                    table = LexerTable(dfa, lambda state: 0)
+                    for transitions, ranges in zip(table.transitions, table.ranges):
+                        assert len(transitions) <= 128 and len(ranges) <= 1
+                    assert DFASimulator(dfa).simulate(BaseElement.element_list_from_string(testcase))
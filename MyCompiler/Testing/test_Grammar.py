@@ -1,6 +1,7 @@
 from unittest import TestCase
 
 from BaseGrammar import BaseGrammar
+from Enums import Associativity, LRAction
 from GrammarFileLoader import GrammarFileLoader
 from Nonterminal import Nonterminal
 from Terminal import Terminal
@@ -302,3 +303,58 @@ class TestGrammar(TestCase):
                         assert False
 
 
+
+    def test_first_and_follow_of_long_chains(self):
+        # A_0 -> A_1 'x0' | 'ε', A_1 -> A_2 'x1' | 'ε', ... and the last one loops back to A_0,
+        # so everything is in one strongly connected component deeper than the recursion limit.
+        n = 1500
+        lines = [f"A{i} -> A{(i + 1) % n} 'x{i}' | 'ε'" for i in range(n)]
+        g = BaseGrammar.from_string('\n'.join(lines))
+        every_x = {Terminal(f'x{i}') for i in range(n)}
+        assert g.first(Nonterminal('A0')) == every_x | {Terminal('ε')}
+        assert g.first(Nonterminal(f'A{n - 1}')) == every_x | {Terminal('ε')}
+        assert g.follow(Nonterminal('A0')) == {Terminal(f'x{n - 1}'), Terminal('$')}
+        assert g.follow(Nonterminal('A1')) == {Terminal('x0')}
+        assert g.first((Nonterminal('A5'), Terminal('y'))) == every_x | {Terminal('y')}
+
+    def test_first_of_suffix(self):
+        for grammar_name in ['4.28', '4.40', '4.55', 'ANSI C']:
+            g = GrammarFileLoader.load(grammar_name)
+            g.augment()
+            for A, productions in g.productions.items():
+                for production in productions:
+                    for i in range(len(production) + 1):
+                        with self.subTest(grammar=grammar_name, A=A, production=production, i=i):
+                            expected = g.first(production[i:]) if i < len(production) else {Terminal('ε')}
+                            assert g.first_of_suffix(A, production, i) == expected
+            # Strings that aren't suffixes of a production are worked out every time, not cached
+            cache_size = len(g._first_cache)
+            g.first([Nonterminal(A.string) for A in sorted(g.nonterminals)])
+            assert len(g._first_cache) == cache_size
+
+    def test_precedence_declarations(self):
+        g = BaseGrammar.from_string("""
+            %left '+' '-'
+            %left '*'
+            %right 'UMINUS'
+            E -> E '+' E | E '*' E
+                | '-' E %prec 'UMINUS' | 'id'
+            """)
+        assert g.precedence == {
+            Terminal('+'): (1, Associativity.LEFT),
+            Terminal('-'): (1, Associativity.LEFT),
+            Terminal('*'): (2, Associativity.LEFT),
+            Terminal('UMINUS'): (3, Associativity.RIGHT),
+        }
+        E = Nonterminal('E')
+        assert Terminal('UMINUS') not in g.terminals
+        assert g.production_precedence_of(E, (E, Terminal('+'), E)) == (1, Associativity.LEFT)
+        assert g.production_precedence_of(E, (Terminal('-'), E)) == (3, Associativity.RIGHT)
+        assert g.production_precedence_of(E, (Terminal('id'),)) is None
+        assert g.resolve_by_precedence(E, (E, Terminal('+'), E), Terminal('*')) == LRAction.SHIFT
+        assert g.resolve_by_precedence(E, (E, Terminal('*'), E), Terminal('+')) == LRAction.REDUCE
+        assert g.resolve_by_precedence(E, (E, Terminal('+'), E), Terminal('-')) == LRAction.REDUCE
+        assert g.resolve_by_precedence(E, (Terminal('-'), E), Terminal('*')) == LRAction.REDUCE
+        assert g.resolve_by_precedence(E, (Terminal('id'),), Terminal('*')) is None
+        # Copies keep the declarations
+        assert g.left_factored().precedence == g.precedence
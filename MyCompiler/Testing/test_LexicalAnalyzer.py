@@ -1,3 +1,6 @@
+import importlib.util
+import os
+import tempfile
 from unittest import TestCase
 
 import RegExpr
@@ -8,8 +11,11 @@ from Tokens import IDToken, NumToken, RelationalOperatorToken, EqualsToken, NotE
     LogicAndToken, LogicOrToken, BitwiseOperatorToken, BitwiseAndToken, BitwiseOrToken, BitwiseXorToken, \
     AssignmentOperatorToken, AssignToken, PlusEqualsToken, MinusEqualsToken, TimesEqualsToken, DivideEqualsToken, \
     BracketToken, LParenToken, RParenToken, LBracketToken, RBracketToken, LCurlyToken, RCurlyToken, EndStatementToken, \
-    KeywordToken, IfToken, ElseToken, WhileToken, ColonToken
+    KeywordToken, IfToken, ElseToken, WhileToken, ColonToken, IntToken, ArrowToken, EllipsisToken, \
+    RShiftEqualsToken, StringLiteralToken
 from Elements import BaseElement
+from LexerGenerator import LexerGenerator
+from PushLexicalAnalyzer import PushLexicalAnalyzer
 
 
 class TestLexicalAnalyzer(TestCase):
@@ -118,3 +124,151 @@ class TestLexicalAnalyzer(TestCase):
                 for token, expected_token in zip(lexer.process(string), expected_tokens):
                     assert isinstance(token, expected_token), f'{token} vs {expected_token}'
 
+    def test_ANSI_C_lexer(self):
+        test_cases = {
+            'int intx': [IntToken, IDToken],
+            'whilee while': [IDToken, WhileToken],
+            'x->y': [IDToken, ArrowToken, IDToken],
+            'a...b': [IDToken, EllipsisToken, IDToken],
+            '1.5e+3f .5 0x1FUL': [NumToken, NumToken, NumToken],
+            'a>>=2': [IDToken, RShiftEqualsToken, NumToken],
+            '"a \\" b"': [StringLiteralToken],
+        }
+
+        lexer = LexicalAnalyzer.LexicalAnalyzer.ANSI_C_lexer()
+        for string, expected_tokens in test_cases.items():
+            with self.subTest(string=string):
+                tokens = list(lexer.process(string))
+                assert len(tokens) == len(expected_tokens), tokens
+                for token, expected_token in zip(tokens, expected_tokens):
+                    assert isinstance(token, expected_token), f'{token} vs {expected_token}'
+
+    def test_followpos_matches_NFA_construction(self):
+        string = 'int main() {\n    x->y = 1.5e+3f;\n    s = "a\\" b";\n    return a...b >>= 0x1FUL;\n}\n'
+        lexer = LexicalAnalyzer.LexicalAnalyzer.ANSI_C_lexer()
+        nfa_lexer = LexicalAnalyzer.LexicalAnalyzer(
+            SymbolTable.SymbolTableManager(), lexer.regular_definition, lexer.translation_rules, build_NFA=True)
+        expected = [(type(token), token.lexeme) for token in nfa_lexer.process(string)]
+        actual = [(type(token), token.lexeme) for token in lexer.process(string)]
+        assert actual == expected
+
+    def test_unicode(self):
+        string = 'char *s = "héllo → 世界 \U0001F389";\nint c = \'é\';\n'
+        expected = ['char', '*', 's', '=', '"héllo → 世界 \U0001F389"', ';', 'int', 'c', '=', "'é'", ';']
+        lexer = LexicalAnalyzer.LexicalAnalyzer.ANSI_C_lexer()
+        for options in [dict(), dict(build_NFA=True), dict(lazy_DFA=True)]:
+            with self.subTest(**options):
+                other_lexer = LexicalAnalyzer.LexicalAnalyzer(
+                    SymbolTable.SymbolTableManager(), lexer.regular_definition, lexer.translation_rules,
+                    **options)
+                assert [token.lexeme for token in other_lexer.process(string)] == expected
+        with self.subTest(lexer='push'):
+            push_lexer = PushLexicalAnalyzer(lexer)
+            tokens = push_lexer.feed(string[:16]) + push_lexer.feed(string[16:]) + push_lexer.close()
+            assert [token.lexeme for token in tokens] == expected
+        with self.subTest(lexer='checkpoints'):
+            checkpoints = lexer.process_with_checkpoints(string)
+            assert [token.lexeme for token in checkpoints.tokens()] == expected
+
+    def test_generated_lexer(self):
+        string = 'int main() {\n    x->y = 1.5e+3f;\n    s = "a\\" é";\n    return a...b >>= 0x1FUL;\n}\n'
+        lexer = LexicalAnalyzer.LexicalAnalyzer.ANSI_C_lexer()
+        expected = [(type(token).__name__, token.lexeme) for token in lexer.process(string)]
+        source = LexerGenerator(lexer).generate()
+        assert [line for line in source.splitlines() if line.startswith(('import', 'from'))] == \
+            ['from bisect import bisect_right']
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'generated_lexer.py')
+            LexerGenerator(lexer).write(path)
+            spec = importlib.util.spec_from_file_location('generated_lexer', path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+        assert list(module.tokens(string)) == expected
+        with self.assertRaises(Exception):
+            list(module.tokens('int @'))
+
+    def test_lazy_DFA(self):
+        string = 'int main() {\n    x->y = 1.5e+3f;\n    s = "a\\" b";\n    return a...b >>= 0x1FUL;\n}\n'
+        lexer = LexicalAnalyzer.LexicalAnalyzer.ANSI_C_lexer()
+        expected = [(type(token), token.lexeme) for token in lexer.process(string)]
+        for max_states in [2, 16, 10000]:
+            with self.subTest(max_states=max_states):
+                lazy_lexer = LexicalAnalyzer.LexicalAnalyzer(
+                    SymbolTable.SymbolTableManager(), lexer.regular_definition, lexer.translation_rules,
+                    lazy_DFA=True)
+                lazy_lexer._simulator.max_states = max_states
+                actual = [(type(token), token.lexeme) for token in lazy_lexer.process(string * 3)]
+                assert actual == expected * 3
+                assert (lazy_lexer._simulator.flushes > 0) == (max_states < 10000)
+                assert len(lazy_lexer._simulator._cache) <= max_states
+
+    def test_linear_time_maximal_munch(self):
+        # With only 'a' and 'a*b' every token attempt on a run of a's scans to the end of the
+        # input before backing off to a single 'a'.
+        reg_def = RegExpr.RegularDefinition.from_string('A a\nAB a*b')
+        translation_rules = [
+            (BaseElement(reg_def['A']), IDToken.lex_action),
+            (BaseElement(reg_def['AB']), NumToken.lex_action),
+        ]
+        lexer = LexicalAnalyzer.LexicalAnalyzer(SymbolTable.SymbolTableManager(), reg_def, translation_rules)
+        ansi_c_lexer = LexicalAnalyzer.LexicalAnalyzer.ANSI_C_lexer()
+        test_cases = [
+            (lexer, 'a' * 300),
+            (lexer, 'a' * 30 + 'b' + 'a' * 30 + 'ab'),
+            (ansi_c_lexer, '.........1.5e+3 "a" x->y'),
+        ]
+        for test_lexer, string in test_cases:
+            with self.subTest(string=string):
+                expected = [(type(token), token.lexeme) for token in test_lexer.process(string)]
+                actual = [(type(token), token.lexeme) for token in test_lexer.process(string, linear_time=True)]
+                assert actual == expected
+
+    def test_process_parallel(self):
+        # The string literal spanning lines makes some chunks start in the middle of a lexeme.
+        string = 'int main() {\n    x->y = 1.5e+3;\n    s = "a\n b\n c";\n    return a...b;\n}\n' * 4
+        lexer = LexicalAnalyzer.LexicalAnalyzer.ANSI_C_lexer()
+        expected = [(type(token), token.lexeme) for token in lexer.process(string)]
+        for chunk_size in [1, 8, 64, 1 << 16]:
+            with self.subTest(chunk_size=chunk_size):
+                actual = [(type(token), token.lexeme)
+                          for token in lexer.process_parallel(string, processes=2, chunk_size=chunk_size)]
+                assert actual == expected
+
+    def test_push_lexical_analyzer(self):
+        string = 'int main() {\n    x->y = 1.5e+3;\n    s = "a\n b";\n    return a...b;\n}\n'
+        lexer = LexicalAnalyzer.LexicalAnalyzer.ANSI_C_lexer()
+        expected = [(type(token), token.lexeme) for token in lexer.process(string)]
+        for chunk_size in [1, 2, 7, len(string)]:
+            with self.subTest(chunk_size=chunk_size):
+                push_lexer = PushLexicalAnalyzer(lexer)
+                tokens = []
+                for i in range(0, len(string), chunk_size):
+                    tokens.extend(push_lexer.feed(string[i:i + chunk_size]))
+                tokens.extend(push_lexer.close())
+                assert [(type(token), token.lexeme) for token in tokens] == expected
+
+    def test_relex(self):
+        string = 'int main() {\n    x->y = 1.5e+3;\n    s = "a b";\n    return a..b;\n}\n' * 20
+        lexer = LexicalAnalyzer.LexicalAnalyzer.ANSI_C_lexer()
+        middle = len(string) // 2
+        # (start, stop, replacement)
+        edits = [
+            (string.index('1.5'), string.index('1.5') + 1, '42'),
+            # The lexeme for the first '.' looked past the second one
+            (string.index('..b') + 2, string.index('..b') + 2, '.'),
+            (string.index('"a b"') + 2, string.index('"a b"') + 3, '" "'),
+            (0, 0, 'x '),
+            (len(string), len(string), 'a'),
+            (middle, middle + 10, ''),
+        ]
+        for start, stop, replacement in edits:
+            with self.subTest(start=start, stop=stop, replacement=replacement):
+                checkpoints = lexer.process_with_checkpoints(string)
+                i, replaced, relexed = lexer.relex(checkpoints, start, stop, replacement)
+                text = string[:start] + replacement + string[stop:]
+                assert checkpoints.text == text
+                expected = [(type(token), token.lexeme) for token in lexer.process(text)]
+                assert [(type(token), token.lexeme) for token in checkpoints.tokens()] == expected
+                assert [lexeme[:2] for lexeme in checkpoints.lexemes] == \
+                       [lexeme[:2] for lexeme in lexer.process_with_checkpoints(text).lexemes]
+                assert len(relexed) < 10
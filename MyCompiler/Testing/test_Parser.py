@@ -1,8 +1,22 @@
+import asyncio
+import importlib.util
+import os
+import tempfile
 from unittest import TestCase
 
+from BaseGrammar import BaseGrammar
+from BatchCompiler import BatchCompiler
 from CanonicalLR1Parser import CanonicalLR1Parser
+from Enums import LRAction
 from GrammarFileLoader import GrammarFileLoader
+from GrammarReport import GrammarReport
+from IncrementalSyntaxAnalyzer import IncrementalSyntaxAnalyzer
+from LexerGenerator import LexerGenerator
 from LexicalAnalyzer import LexicalAnalyzer
+from LL1Parser import LL1Parser
+from LRPushParser import LRPushParser
+from ParserGenerator import ParserGenerator
+from PushLexicalAnalyzer import PushLexicalAnalyzer
 from SLR1Parser import SLR1Parser
 from SpaceConsumingLALRParser import SpaceConsumingLALRParser
 
@@ -120,6 +134,373 @@ class Test(TestCase):
         ]
         create_parse_tree(self, grammar_file_name, grammar, parser, lexer, test_cases)
 
+    def test_4_28_LL1_to_parse_tree(self):
+        parser = LL1Parser(GrammarFileLoader.load('4.28'))
+        lexer = LexicalAnalyzer.ANSI_C_lexer()
+        tree = parser.to_parse_tree(parser.produce_derivation(lexer.process('(a + b) * c')))
+        symbols = []
+        leaves = []
+
+        def walk(node):
+            symbols.append(repr(node))
+            if len(node.children) == 0 and repr(node) != 'ε':
+                leaves.append(node.symbol.lexeme)
+            for child in node.children:
+                walk(child)
+        walk(tree)
+        assert leaves == ['(', 'a', '+', 'b', ')', '*', 'c']
+        assert symbols[:4] == ["'E'", "'T'", "'F'", "LParenToken(lexeme: '(')"]
+
+        for text in ['a + * b', '(a', 'a b']:
+            with self.subTest(text=text):
+                with self.assertRaises(Exception):
+                    list(parser.produce_derivation(lexer.process(text)))
+
+    def test_4_40_SLR1_batch_compile(self):
+        grammar = GrammarFileLoader.load('4.40')
+        parser = SLR1Parser(grammar)
+        lexer = LexicalAnalyzer.ANSI_C_lexer()
+        # Each file's parse tree in preorder, or None for a syntax error
+        test_cases = {
+            'a.c': ('a * b + c', [
+                "'Ep'", "'E'", "'E'", "'T'", "'T'", "'F'", "IDToken(lexeme: 'a')", "AsterixToken(lexeme: '*')",
+                "'F'", "IDToken(lexeme: 'b')", "PlusToken(lexeme: '+')", "'T'", "'F'", "IDToken(lexeme: 'c')"]),
+            'b.c': ('(ab)', [
+                "'Ep'", "'E'", "'T'", "'F'", "LParenToken(lexeme: '(')", "'E'", "'T'", "'F'",
+                "IDToken(lexeme: 'ab')", "RParenToken(lexeme: ')')"]),
+            'c.c': ('a+b*c', [
+                "'Ep'", "'E'", "'E'", "'T'", "'F'", "IDToken(lexeme: 'a')", "PlusToken(lexeme: '+')", "'T'",
+                "'T'", "'F'", "IDToken(lexeme: 'b')", "AsterixToken(lexeme: '*')", "'F'", "IDToken(lexeme: 'c')"]),
+            'd.c': ('a+*c', None),
+            'e.c': ('a+', None),
+        }
+        batch_compiler = BatchCompiler(lexer, parser, processes=2)
+        with tempfile.TemporaryDirectory() as directory:
+            paths = []
+            for name, (text, _) in test_cases.items():
+                paths.append(os.path.join(directory, name))
+                with open(paths[-1], mode='w', encoding='utf-8') as f:
+                    f.write(text)
+
+            results = {path: (tree, error) for path, tree, error in batch_compiler.compile_files(paths)}
+        assert set(results.keys()) == set(paths)
+        for path in paths:
+            text, expected = test_cases[os.path.basename(path)]
+            with self.subTest(test_case=text):
+                tree, error = results[path]
+                if expected is None:
+                    assert tree is None
+                    assert error is not None
+                else:
+                    assert error is None
+                    assert preorder(tree) == expected
+
+    def test_4_40_SLR1_push_parse(self):
+        grammar = GrammarFileLoader.load('4.40')
+        parser = SLR1Parser(grammar)
+        lexer = LexicalAnalyzer.ANSI_C_lexer()
+        test_cases = [
+            'a * b + c',
+            '(ab)',
+            'a+b*(c+d)*e',
+        ]
+
+        async def parse(reader):
+            # Lex and parse whatever has arrived while the rest is still on its way
+            push_lexer = PushLexicalAnalyzer(lexer)
+            push_parser = LRPushParser(parser)
+            derivation = []
+            while chunk := await reader.read(3):
+                derivation.extend(push_parser.feed(push_lexer.feed(chunk.decode())))
+            derivation.extend(push_parser.feed(push_lexer.close()))
+            derivation.extend(push_parser.close())
+            return derivation
+
+        async def parse_from_stream(test_case):
+            reader = asyncio.StreamReader()
+            parsing = asyncio.ensure_future(parse(reader))
+            for character in test_case:
+                reader.feed_data(character.encode())
+                await asyncio.sleep(0)
+            reader.feed_eof()
+            return await parsing
+
+        for test_case in test_cases:
+            with self.subTest(test_case=test_case):
+                expected = list(parser.produce_derivation(lexer.process(test_case)))
+                actual = asyncio.run(parse_from_stream(test_case))
+                assert [(repr(a), b) for a, b in actual] == [(repr(a), b) for a, b in expected]
+                assert str(parser.to_parse_tree(iter(actual))) == str(parser.to_parse_tree(iter(expected)))
+
+    def test_4_40_SLR1_incremental_parse(self):
+        grammar = GrammarFileLoader.load('4.40')
+        parser = SLR1Parser(grammar)
+        lexer = LexicalAnalyzer.ANSI_C_lexer()
+        original = ' + '.join(f'(a{i} * b{i} + c{i})' for i in range(20))
+        # (start, stop, replacement)
+        edits = [
+            (original.index('b3'), original.index('b3') + 2, 'x'),
+            (original.index('c19'), original.index('c19') + 3, 'c19 * d'),
+            (0, 0, 'z + '),
+            (original.index(' + (a7'), original.index(' + (a7'), '  '),
+            (original.index('a10'), original.index('a10') + 2, 'a100'),
+            (original.index('(a12'), original.index('c13)') + 4, 'e'),
+        ]
+        for start, stop, replacement in edits:
+            with self.subTest(start=start, stop=stop, replacement=replacement):
+                incremental = IncrementalSyntaxAnalyzer(lexer, parser)
+                incremental.process(original)
+                tree = incremental.edit(start, stop, replacement)
+                text = original[:start] + replacement + original[stop:]
+                assert incremental.text == text
+                expected = parser.to_parse_tree(parser.produce_derivation(lexer.process(text)))
+                assert str(tree) == str(expected)
+                # Only the neighbourhood of the edit gets lexed again
+                assert incremental.relexed_count < 10
+                assert incremental.reused_count > 0
+
+        # Edits build on each other, going right to left keeps the offsets above valid
+        incremental = IncrementalSyntaxAnalyzer(lexer, parser)
+        incremental.process(original)
+        text = original
+        for start, stop, replacement in sorted(edits, reverse=True):
+            text = text[:start] + replacement + text[stop:]
+            incremental.edit(start, stop, replacement)
+        expected = parser.to_parse_tree(parser.produce_derivation(lexer.process(text)))
+        assert str(incremental.tree) == str(expected)
+
+    def test_4_40_generated_parser(self):
+        lexer = LexicalAnalyzer.ANSI_C_lexer()
+        text = 'a * (b + c) * d + e'
+        tokens = list(lexer.process(text))
+
+        def as_tuples(tree):
+            if len(tree.children) == 0:
+                return type(tree.symbol).__name__, tree.symbol.lexeme
+            return tree.symbol.string, tuple(as_tuples(child) for child in tree.children)
+
+        with tempfile.TemporaryDirectory() as directory:
+            LexerGenerator(lexer).write(os.path.join(directory, 'generated_lexer.py'))
+            generated_lexer = load_module(os.path.join(directory, 'generated_lexer.py'))
+            for parser_class in [SLR1Parser, SpaceConsumingLALRParser, CanonicalLR1Parser]:
+                with self.subTest(parser=parser_class.__name__):
+                    parser = parser_class(GrammarFileLoader.load('4.40'))
+                    path = os.path.join(directory, f'generated_{parser_class.__name__}.py')
+                    ParserGenerator(parser).write(path)
+                    with open(path, encoding='utf-8') as f:
+                        assert not any(line.startswith(('import', 'from')) for line in f)
+                    generated_parser = load_module(path)
+                    expected = as_tuples(parser.to_parse_tree(parser.produce_derivation(iter(tokens))))
+                    assert generated_parser.parse(generated_lexer.tokens(text)) == expected
+                    with self.assertRaises(Exception):
+                        generated_parser.parse(generated_lexer.tokens('a * + b'))
+
+
+    def test_grammar_report(self):
+        # The report of 4.40 has to match the tables the parsers actually build
+        report = GrammarReport(GrammarFileLoader.load('4.40'))
+        for kind, parser_class in [('SLR1', SLR1Parser), ('LALR', SpaceConsumingLALRParser), ('LR1', CanonicalLR1Parser)]:
+            with self.subTest(kind=kind):
+                result = report.analyze(kind)
+                table = parser_class(GrammarFileLoader.load('4.40'))._parsing_table
+                assert result['action_entries'] == len(table._action_table)
+                assert result['goto_entries'] == len(table._goto_table)
+                assert result['states'] == len({s for s, _ in table._action_table} | {s for s, _ in table._goto_table})
+                assert result['conflicts'] == []
+
+        # 4.3 is ambiguous: after E + E with * or + next, reducing and shifting are both possible
+        report = GrammarReport(GrammarFileLoader.load('4.3'))
+        for kind, parser_class, count in [('SLR1', SLR1Parser, 4), ('LALR', SpaceConsumingLALRParser, 4),
+                                          ('LR1', CanonicalLR1Parser, 8)]:
+            with self.subTest(kind=kind):
+                result = report.analyze(kind)
+                assert len(result['conflicts']) == count
+                # The states are numbered like in the table, so its conflicts can be matched up
+                table = parser_class(GrammarFileLoader.load('4.3'), resolve_conflicts=True)._parsing_table
+                assert ({(conflict['state'], conflict['lookahead']) for conflict in result['conflicts']} ==
+                        {(conflict.state, conflict.token.__name__) for conflict in table.conflicts})
+                assert all(conflict['type'] == 'shift/reduce' for conflict in result['conflicts'])
+                prefixes = {(tuple(X.string for X in conflict['prefix']), conflict['lookahead'])
+                            for conflict in result['conflicts']}
+                assert (('E', "'+'", 'E'), 'AsterixToken') in prefixes
+                assert f"{count} conflicts" in report.format([result])
+
+        # Entries are keyed by token class like in the tables: 'num' and 'str' are both
+        # NumTokens, so reducing A and reducing B after 'id' are wanted for the same entry
+        grammar_text = """
+            S -> A 'num' | B 'str'
+            A -> 'id'
+            B -> 'id'
+            """
+        report = GrammarReport(BaseGrammar.from_string(grammar_text))
+        for kind, parser_class in [('SLR1', SLR1Parser), ('LALR', SpaceConsumingLALRParser), ('LR1', CanonicalLR1Parser)]:
+            with self.subTest(kind=kind, grammar='shared token class'):
+                result = report.analyze(kind)
+                table = parser_class(BaseGrammar.from_string(grammar_text), resolve_conflicts=True)._parsing_table
+                assert result['action_entries'] == len(table._action_table)
+                assert len(result['conflicts']) == len(table.conflicts) == 1
+                assert result['conflicts'][0]['type'] == table.conflicts[0].kind() == 'reduce/reduce'
+                assert result['conflicts'][0]['lookahead'] == 'NumToken'
+
+    def test_4_3_conflicts(self):
+        lexer = LexicalAnalyzer.ANSI_C_lexer()
+        for parser_class, count in [(SLR1Parser, 4), (SpaceConsumingLALRParser, 4), (CanonicalLR1Parser, 8)]:
+            with self.subTest(parser=parser_class.__name__):
+                # The whole table is built and every conflict reported, not just the first
+                with self.assertRaises(Exception) as context:
+                    parser_class(GrammarFileLoader.load('4.3'))
+                assert f'{count} conflicting actions exist' in str(context.exception)
+
+                # Resolved like yacc does, shifting makes + and * right associative with the
+                # same precedence
+                parser = parser_class(GrammarFileLoader.load('4.3'), resolve_conflicts=True)
+                conflicts = parser._parsing_table.conflicts
+                assert len(conflicts) == count
+                assert all(conflict.kind() == 'shift/reduce' for conflict in conflicts)
+                assert all(conflict.resolution[0] == LRAction.SHIFT for conflict in conflicts)
+                tree = parser.to_parse_tree(parser.produce_derivation(iter(list(lexer.process('a * b + c')))))
+                # a * (b + c)
+                assert len(tree.children) == 3 and tree.children[1].symbol.lexeme == '*'
+                assert len(tree.children[2].children) == 3 and tree.children[2].children[1].symbol.lexeme == '+'
+
+    def test_accept_conflicts(self):
+        # After S, $ could mean accepting or reducing S -> S, neither of which is a shift
+        grammar_text = """
+            S -> S | 'id'
+            """
+        report = GrammarReport(BaseGrammar.from_string(grammar_text))
+        for kind, parser_class in [('SLR1', SLR1Parser), ('LALR', SpaceConsumingLALRParser), ('LR1', CanonicalLR1Parser)]:
+            with self.subTest(kind=kind):
+                conflicts = parser_class(BaseGrammar.from_string(grammar_text), resolve_conflicts=True)._parsing_table.conflicts
+                assert [conflict.kind() for conflict in conflicts] == ['accept/reduce']
+                assert [conflict['type'] for conflict in report.analyze(kind)['conflicts']] == ['accept/reduce']
+
+    def test_4_3_precedence(self):
+        lexer = LexicalAnalyzer.ANSI_C_lexer()
+
+        def bracketed(tree):
+            if len(tree.children) == 0:
+                return tree.symbol.lexeme
+            if len(tree.children) == 1:
+                return bracketed(tree.children[0])
+            return '(' + ' '.join(bracketed(child) for child in tree.children) + ')'
+
+        test_cases = [
+            ('a - b - c * d', '((a - b) - (c * d))'),
+            ('a * b / c + d', '(((a * b) / c) + d)'),
+            ('- a * b', '((- a) * b)'),
+        ]
+        for parser_class in [SLR1Parser, SpaceConsumingLALRParser, CanonicalLR1Parser]:
+            # The declarations settle every conflict of the ambiguous grammar
+            parser = parser_class(GrammarFileLoader.load('4.3_precedence'))
+            assert parser._parsing_table.conflicts == []
+            for text, expected in test_cases:
+                with self.subTest(parser=parser_class.__name__, text=text):
+                    tokens = list(lexer.process(text))
+                    assert bracketed(parser.to_parse_tree(parser.produce_derivation(iter(tokens)))) == expected
+
+        # A nonassoc operator can't follow itself
+        grammar = BaseGrammar.from_string("""
+            %nonassoc '=='
+            %left '+'
+            E -> E '==' E | E '+' E | 'id'
+            """)
+        parser = SLR1Parser(grammar)
+        tokens = list(lexer.process('a == b + c'))
+        assert bracketed(parser.to_parse_tree(parser.produce_derivation(iter(tokens)))) == '(a == (b + c))'
+        with self.assertRaises(Exception):
+            parser.to_parse_tree(parser.produce_derivation(iter(list(lexer.process('a == b == c')))))
+
+    def test_4_40_bypass_unit_reductions(self):
+        lexer = LexicalAnalyzer.ANSI_C_lexer()
+
+        def leaves(tree):
+            if len(tree.children) == 0:
+                return [tree.symbol.lexeme]
+            return [lexeme for child in tree.children for lexeme in leaves(child)]
+
+        def chain_nodes(tree):
+            # Nodes whose only child is a nonterminal's node
+            count = 1 if len(tree.children) == 1 and len(tree.children[0].children) > 0 else 0
+            return count + sum(chain_nodes(child) for child in tree.children)
+
+        for parser_class in [SLR1Parser, SpaceConsumingLALRParser, CanonicalLR1Parser]:
+            parser = parser_class(GrammarFileLoader.load('4.40'))
+            bypassing_parser = parser_class(GrammarFileLoader.load('4.40'), bypass_unit_reductions=True)
+            for text in ['a * (b + c) * d + e', 'a', '((a))']:
+                with self.subTest(parser=parser_class.__name__, text=text):
+                    tokens = list(lexer.process(text))
+                    derivation = list(parser.produce_derivation(iter(tokens)))
+                    short_derivation = list(bypassing_parser.produce_derivation(iter(tokens)))
+                    assert len(short_derivation) < len(derivation)
+                    assert all(len(production) != 1 or production[0] not in parser._grammar.nonterminals
+                               for _, production in short_derivation if production is not None)
+                    tree = parser.to_parse_tree(iter(derivation))
+                    short_tree = bypassing_parser.to_parse_tree(iter(short_derivation))
+                    assert leaves(short_tree) == leaves(tree)
+                    assert chain_nodes(tree) > 0 and chain_nodes(short_tree) == 0
+
+            with self.subTest(parser=parser_class.__name__, text='a + * b'):
+                tokens = list(lexer.process('a + * b'))
+                derivation = list(bypassing_parser.produce_derivation(iter(tokens)))
+                with self.assertRaises(Exception):
+                    bypassing_parser.to_parse_tree(iter(derivation))
+
+    def test_4_40_default_reductions(self):
+        lexer = LexicalAnalyzer.ANSI_C_lexer()
+        text = 'a * (b + c) * d + e'
+        tokens = list(lexer.process(text))
+        for parser_class in [SLR1Parser, SpaceConsumingLALRParser, CanonicalLR1Parser]:
+            with self.subTest(parser=parser_class.__name__):
+                parser = parser_class(GrammarFileLoader.load('4.40'))
+                defaulting_parser = parser_class(GrammarFileLoader.load('4.40'), default_reductions=True)
+                assert len(defaulting_parser._parsing_table._action_table) < len(parser._parsing_table._action_table)
+                derivation = list(parser.produce_derivation(iter(tokens)))
+                assert [(repr(a), b) for a, b in defaulting_parser.produce_derivation(iter(tokens))] == \
+                       [(repr(a), b) for a, b in derivation]
+                for bad_text in ['a + * b', '(a', 'a b']:
+                    with self.assertRaises(Exception):
+                        push_parser = LRPushParser(defaulting_parser)
+                        push_parser.feed(lexer.process(bad_text))
+                        push_parser.close()
+
+                # F -> id and T -> F are made as soon as a is shifted, E -> T has to wait to see
+                # whether a * follows
+                push_parser = LRPushParser(defaulting_parser)
+                assert [b for _, b in push_parser.feed(tokens[:1])] == [None, derivation[1][1], derivation[2][1]]
+
+                # Bypassing unit reductions on top of it
+                bypassing_parser = parser_class(GrammarFileLoader.load('4.40'), bypass_unit_reductions=True,
+                                                default_reductions=True)
+                short_derivation = list(bypassing_parser.produce_derivation(iter(tokens)))
+                assert all(len(production) != 1 or production[0] not in parser._grammar.nonterminals
+                           for _, production in short_derivation if production is not None)
+
+                with tempfile.TemporaryDirectory() as directory:
+                    path = os.path.join(directory, 'generated_parser.py')
+                    ParserGenerator(defaulting_parser).write(path)
+                    generated_parser = load_module(path)
+                    generated_lexer_tokens = [(type(token).__name__, token.lexeme) for token in tokens]
+                    tree = generated_parser.parse(generated_lexer_tokens)
+                    assert tree[0] == derivation[-1][0].string
+                    with self.assertRaises(Exception):
+                        generated_parser.parse([(type(token).__name__, token.lexeme)
+                                                for token in lexer.process('a * + b')])
+
+def load_module(path):
+    spec = importlib.util.spec_from_file_location(os.path.splitext(os.path.basename(path))[0], path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def preorder(tree):
+    # The repr of every node of a parse tree, parents before their children
+    symbols = [repr(tree)]
+    for child in tree.children:
+        symbols.extend(preorder(child))
+    return symbols
+
 
 def create_parse_tree(test, grammar_file_name, grammar, parser, lexer, test_cases):
     for test_case in test_cases:
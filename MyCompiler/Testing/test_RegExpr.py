@@ -33,6 +33,45 @@ class TestRegularDefinition(TestCase):
 
 
 class TestRegExprParseTree(TestCase):
+    def test_build_from_expression(self):
+        def shape(tree):
+            if tree.operation == RegexOperation.IDENTITY:
+                return str(tree.left)
+            elif tree.operation == RegexOperation.GROUP:
+                return f'({shape(tree.left)})'
+            elif tree.operation == RegexOperation.QUANTIFIER:
+                return f'Q[{shape(tree.left)}]{tree.right}'
+            elif tree.operation == RegexOperation.CONCAT:
+                return f'C[{shape(tree.left)},{shape(tree.right)}]'
+            return f'U[{shape(tree.left)},{shape(tree.right)}]'
+
+        test_cases = {
+            r'a': 'a',
+            r'abc': 'C[C[a,b],c]',
+            r'a|b|c': 'U[U[a,b],c]',
+            r'ab|cd': 'U[C[a,b],C[c,d]]',
+            r'a*?': 'Q[Q[a]*]?',
+            r'(a|b)*c': 'C[Q[(U[a,b])]*,c]',
+            r'a{2,3}(b)': 'C[Q[a]{2,3},(b)]',
+            r'[a]	': 'C[a,\t]',
+            r'[a]\t': 'C[a,\t]',
+            r'[a-c_x]\d': 'C[[_a-cx],[0-9]]',
+            r'[(]|)': None,
+            r'(a': None,
+            r'a|': None,
+            r'*a': None,
+        }
+        for regex, expected in test_cases.items():
+            with self.subTest(regex=regex):
+                if expected is None:
+                    self.assertRaises(Exception, lambda: RegExpr.from_string(regex))
+                else:
+                    assert shape(RegExpr.from_string(regex).parse_tree) == expected
+
+        # Long expressions don't run into the recursion limit
+        long_regex = RegExpr.from_string('|'.join(['ab[cd]e?'] * 5000))
+        assert long_regex.parse_tree.operation == RegexOperation.UNION
+
     def test_range_over_chars(self):
         positive_cases = [
             ('a', 'b'),